@@ -6,20 +6,24 @@ A privacy-first cybersecurity awareness web application for educational purposes
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-from streamlit_folium import st_folium
 import logging
-from typing import List
+from typing import List, Optional
 
 # Import custom modules
-from src.utils import load_config, setup_logging, format_number
-from src.data_processor import DataProcessor
+from src.utils import load_config, setup_logging, format_number, validate_ip, MARKER_COLORS
+from src.data_processor import DataProcessor, NodeView, NODE_COLUMNS, DISPLAY_DTYPES
 from src.geo_analyzer import GeoAnalyzer
 from src.risk_engine import RiskEngine, VPNNode
-from src.visualizations import Visualizer
 from src.education import EducationModule
 
 
+# Partial reruns need Streamlit >= 1.33 (st.experimental_fragment, st.fragment
+# from 1.37); on older versions decorated sections rerun with the whole page
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+
 # Page configuration
 st.set_page_config(
     page_title="Celeste Map - Dark Web Awareness",
@@ -47,11 +51,119 @@ def initialize_components():
     data_processor = DataProcessor(config)
     geo_analyzer = GeoAnalyzer(config)
     risk_engine = RiskEngine(config.get('risk_engine', {}))
-    visualizer = Visualizer(config)
     education = EducationModule()
-    return data_processor, geo_analyzer, risk_engine, visualizer, education
+    return data_processor, geo_analyzer, risk_engine, education
+
+data_processor, geo_analyzer, risk_engine, education = initialize_components()
+
+
+@st.cache_resource
+def get_visualizer():
+    """
+    Create the visualizer on first use.
+    
+    Importing src.visualizations pulls in Folium, Plotly and pydeck, which
+    the text-only pages never need.
+    """
+    from src.visualizations import Visualizer
+    return Visualizer(config)
+
+
+# Session state entries that belong to the currently loaded dataset
+DATASET_KEYS = ('nodes', 'df', 'country_options', 'max_risk', 'agg', 'dataset_key', 'display', 'dash_page')
+TABLE_PAGE_SIZE = 500
+
+
+def store_dataset(nodes: Optional[List[VPNNode]], df: pd.DataFrame = None):
+    """
+    Store processed nodes and the values derived from them in session state.
+    
+    When only df is given, the stored nodes are a NodeView over it.
+    """
+    if df is None:
+        df = data_processor.nodes_to_dataframe(nodes)
+    else:
+        df = data_processor.compact_dataframe(df.reindex(columns=NODE_COLUMNS))
+        df = data_processor.add_display_columns(df)
+    df['country'] = df['country'].astype('category')
+    df['risk_level'] = df['risk_level'].astype('category')
+    
+    if nodes is None:
+        nodes = NodeView(df)
+    
+    st.session_state['nodes'] = nodes
+    st.session_state['df'] = df
+    # Countries ordered by node count, so the default filter picks the most common ones
+    st.session_state['country_options'] = df['country'].value_counts().index.tolist()
+    st.session_state['max_risk'] = float(df['risk_score'].max())
+    st.session_state['agg'] = data_processor.get_chart_aggregates(df)
+    st.session_state['dataset_key'] = data_processor.get_dataframe_key(df)
+    
+    # Sidebar metrics, formatted once per dataset
+    stats = get_cached_statistics(st.session_state['dataset_key'], df)
+    st.session_state['display'] = {
+        'total': format_number(stats['total']),
+        'high_risk': format_number(stats['high_risk']),
+        'average_score': stats['average_score']
+    }
+    st.session_state['dash_page'] = 0
+
+
+def clear_dataset():
+    """Remove the loaded dataset from session state."""
+    for key in DATASET_KEYS:
+        st.session_state.pop(key, None)
 
-data_processor, geo_analyzer, risk_engine, visualizer, education = initialize_components()
+
+def set_table_page(page: int):
+    """Select the page shown in the dashboard node table."""
+    st.session_state['dash_page'] = page
+
+
+def get_nodes_key() -> str:
+    """Content fingerprint of the loaded dataset, computed once when it is stored."""
+    return st.session_state['dataset_key']
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_cached_dataset(cache_key: str) -> Optional[pd.DataFrame]:
+    """Load a processed upload from the on-disk cache."""
+    return data_processor.load_cached_dataframe(cache_key)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_cached_statistics(nodes_key: str, _df: pd.DataFrame) -> dict:
+    """Risk statistics for the loaded dataset, computed once per ``nodes_key``."""
+    return risk_engine.get_statistics(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_map_html(map_type: str, use_clusters: bool, nodes_key: str,
+                   _nodes: List[VPNNode], _df: pd.DataFrame) -> str:
+    """
+    Render a Folium map to standalone HTML once per dataset and map settings.
+    
+    ``_nodes`` and ``_df`` are not hashed by Streamlit (leading underscore);
+    ``nodes_key`` identifies the dataset instead, so reruns reuse the cached
+    page. Only the HTML is kept, not the Folium element tree it was rendered from.
+    """
+    if map_type == "Heat Map":
+        map_obj = get_visualizer().create_heatmap(_df)
+    else:
+        map_obj = get_visualizer().create_world_map(_nodes, use_clusters=use_clusters)
+    return map_obj.get_root().render()
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_geographic_scatter(nodes_key: str, _df: pd.DataFrame):
+    """Build the dashboard geographic scatter once per dataset."""
+    return get_visualizer().create_geographic_scatter_df(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_deck_html(nodes_key: str, _df: pd.DataFrame) -> str:
+    """Render the large-dataset pydeck map to standalone HTML once per dataset."""
+    return get_visualizer().create_world_deck(_df).to_html(as_string=True)
 
 
 def show_privacy_banner():
@@ -179,83 +291,103 @@ def render_data_upload():
             min_value=0,
             max_value=1000,
             value=50,
-            help="Limit the number of API calls to avoid rate limits"
+            help="Limit the number of API calls to avoid rate limits (one call looks up to 100 IPs)"
         )
     
     if uploaded_file is not None:
         try:
-            with st.spinner("Loading data..."):
-                # Load data based on file type
-                if uploaded_file.name.endswith('.csv'):
-                    df = data_processor.load_csv_from_upload(uploaded_file)
-                else:
-                    df = data_processor.load_json_from_upload(uploaded_file)
-                
-                st.success(f"✅ Loaded {len(df)} records from {uploaded_file.name}")
-                
-                # Validate data
-                is_valid, errors = data_processor.validate_dataframe(df)
-                
-                if not is_valid:
-                    st.error("❌ Data validation failed:")
-                    for error in errors:
-                        st.write(f"- {error}")
-                    return
-                
-                # Clean data
-                df = data_processor.clean_dataframe(df)
-                st.info(f"🧹 Cleaned data: {len(df)} records remaining")
-                
-                # Show preview
-                with st.expander("📋 Data Preview", expanded=True):
-                    st.dataframe(df.head(20), use_container_width=True)
-                
-                # Convert to nodes
-                with st.spinner("Converting to node objects..."):
-                    nodes = data_processor.dataframe_to_nodes(df)
-                
-                # Enrich with geolocation
-                with st.spinner("Enriching with geolocation data..."):
-                    nodes = geo_analyzer.enrich_nodes(
-                        nodes, 
-                        use_api=use_api_enrichment,
-                        max_api_calls=max_api_calls
-                    )
-                
-                # Perform risk assessment
-                with st.spinner("Performing risk assessment..."):
-                    nodes = risk_engine.assess_nodes(nodes)
-                
-                # Store in session state
-                st.session_state['nodes'] = nodes
-                st.session_state['df'] = data_processor.nodes_to_dataframe(nodes)
-                
-                st.success("✅ Data processed successfully!")
-                
-                # Show statistics
-                stats = risk_engine.get_statistics(nodes)
-                
-                st.markdown("### 📊 Dataset Statistics")
-                
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Total Nodes", format_number(stats['total']))
-                    st.metric("High Risk", format_number(stats['high_risk']))
-                
-                with col2:
-                    st.metric("Average Risk Score", stats['average_score'])
-                    st.metric("Medium Risk", format_number(stats['medium_risk']))
-                
-                with col3:
-                    st.metric("High Risk %", f"{stats['high_risk_pct']}%")
-                    st.metric("Low Risk", format_number(stats['low_risk']))
-                
-                with col4:
-                    st.metric("Medium Risk %", f"{stats['medium_risk_pct']}%")
-                    st.metric("Unknown", format_number(stats['unknown']))
-                
-                st.info("💡 **Tip:** Navigate to the Dashboard or Map View to visualize this data!")
+            # Reuse the processed result if this file was handled before
+            cache_key = data_processor.get_cache_key(
+                uploaded_file.getvalue(), use_api_enrichment, max_api_calls
+            )
+            cached_df = load_cached_dataset(cache_key)
+            
+            if cached_df is not None:
+                store_dataset(None, cached_df)
+                st.success(f"✅ Loaded {len(cached_df)} processed records for {uploaded_file.name} from cache")
+            else:
+                with st.spinner("Loading data..."):
+                    # Load data based on file type
+                    if uploaded_file.name.endswith('.csv'):
+                        df = data_processor.load_csv_from_upload(uploaded_file)
+                    else:
+                        df = data_processor.load_json_from_upload(uploaded_file)
+                    
+                    st.success(f"✅ Loaded {len(df)} records from {uploaded_file.name}")
+                    
+                    # Validate data
+                    is_valid, errors = data_processor.validate_dataframe(df)
+                    
+                    if not is_valid:
+                        st.error("❌ Data validation failed:")
+                        for error in errors:
+                            st.write(f"- {error}")
+                        return
+                    
+                    # Clean data
+                    df = data_processor.clean_dataframe(df)
+                    st.info(f"🧹 Cleaned data: {len(df)} records remaining")
+                    
+                    # Show preview
+                    with st.expander("📋 Data Preview", expanded=True):
+                        st.dataframe(df.head(20), use_container_width=True)
+                    
+                    if use_api_enrichment:
+                        # Convert to nodes
+                        with st.spinner("Converting to node objects..."):
+                            nodes = data_processor.dataframe_to_nodes(df)
+                        
+                        # Enrich with geolocation and assess each node in one pass
+                        with st.spinner("Enriching and assessing nodes..."):
+                            nodes = list(geo_analyzer.enrich_and_assess(
+                                nodes,
+                                risk_engine,
+                                use_api=use_api_enrichment,
+                                max_api_calls=max_api_calls
+                            ))
+                        
+                        processed_df = None
+                    else:
+                        # Without API lookups, enrichment and assessment run column-wise
+                        with st.spinner("Enriching and assessing nodes..."):
+                            processed_df = risk_engine.assess_dataframe(geo_analyzer.enrich_dataframe(df))
+                        
+                        # Nodes are created on demand from the stored DataFrame
+                        nodes = None
+                    
+                    # Store in session state
+                    store_dataset(nodes, processed_df)
+                    
+                    # Cache the processed result for later uploads of the same file
+                    data_processor.save_cached_dataframe(cache_key, st.session_state['df'])
+                    load_cached_dataset.clear()
+                    
+                    st.success("✅ Data processed successfully!")
+            
+            # Show statistics
+            stats = get_cached_statistics(get_nodes_key(), st.session_state['df'])
+            
+            st.markdown("### 📊 Dataset Statistics")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Nodes", format_number(stats['total']))
+                st.metric("High Risk", format_number(stats['high_risk']))
+            
+            with col2:
+                st.metric("Average Risk Score", stats['average_score'])
+                st.metric("Medium Risk", format_number(stats['medium_risk']))
+            
+            with col3:
+                st.metric("High Risk %", f"{stats['high_risk_pct']}%")
+                st.metric("Low Risk", format_number(stats['low_risk']))
+            
+            with col4:
+                st.metric("Medium Risk %", f"{stats['medium_risk_pct']}%")
+                st.metric("Unknown", format_number(stats['unknown']))
+            
+            st.info("💡 **Tip:** Navigate to the Dashboard or Map View to visualize this data!")
         
         except Exception as e:
             st.error(f"❌ Error processing file: {str(e)}")
@@ -276,12 +408,10 @@ def render_dashboard():
         st.warning("⚠️ No data loaded. Please upload data first in the 'Data Upload' section.")
         return
     
-    nodes: List[VPNNode] = st.session_state['nodes']
-    
     # Summary statistics
     st.markdown("### 📈 Overview")
     
-    stats = risk_engine.get_statistics(nodes)
+    stats = get_cached_statistics(get_nodes_key(), st.session_state['df'])
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
@@ -301,17 +431,19 @@ def render_dashboard():
     
     st.markdown("---")
     
-    # Visualizations
+    # Visualizations, drawn from counts precomputed when the data was loaded
+    visualizer = get_visualizer()
+    agg = st.session_state['agg']
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("### 🎯 Risk Level Distribution")
-        fig = visualizer.create_risk_distribution_chart(nodes)
+        fig = visualizer.create_risk_distribution_chart(agg['risk_level_counts'])
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### 📊 Risk Score Distribution")
-        fig = visualizer.create_risk_score_histogram(nodes)
+        fig = visualizer.create_risk_score_histogram(agg['risk_score_hist'])
         st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("---")
@@ -321,62 +453,85 @@ def render_dashboard():
     
     with col1:
         st.markdown("### 🌍 Top Countries")
-        fig = visualizer.create_country_distribution_chart(nodes, top_n=15)
+        fig = visualizer.create_country_distribution_chart(agg['country_top'], top_n=15)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### 🔌 Port Usage")
-        fig = visualizer.create_port_distribution_chart(nodes, top_n=15)
+        fig = visualizer.create_port_distribution_chart(agg['port_top'], top_n=15)
         st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("---")
     
     # Geographic scatter plot
     st.markdown("### 🗺️ Geographic Distribution")
-    fig = visualizer.create_geographic_scatter(nodes)
+    fig = build_geographic_scatter(get_nodes_key(), st.session_state['df'])
     st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("---")
     
     # Detailed data table
     with st.expander("📋 Detailed Node Data", expanded=False):
-        df = st.session_state['df']
-        
-        # Add filters
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            risk_filter = st.multiselect(
-                "Filter by Risk Level",
-                options=['High', 'Medium', 'Low', 'Unknown'],
-                default=['High', 'Medium', 'Low', 'Unknown']
-            )
-        
-        with col2:
-            countries = df['country'].unique().tolist()
-            country_filter = st.multiselect(
-                "Filter by Country",
-                options=countries,
-                default=countries[:10] if len(countries) > 10 else countries
-            )
-        
-        with col3:
-            min_risk_score = st.slider(
-                "Minimum Risk Score",
-                min_value=0.0,
-                max_value=float(df['risk_score'].max()),
-                value=0.0
-            )
-        
-        # Apply filters
-        filtered_df = df[
-            (df['risk_level'].isin(risk_filter)) &
-            (df['country'].isin(country_filter)) &
-            (df['risk_score'] >= min_risk_score)
-        ]
-        
-        st.write(f"Showing {len(filtered_df)} of {len(df)} nodes")
-        st.dataframe(filtered_df, use_container_width=True, height=400)
+        render_node_table()
+
+
+@fragment
+def render_node_table():
+    """Render the filterable node table; its widgets rerun only this part of the page."""
+    df = st.session_state['df']
+    
+    # Add filters
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        risk_filter = st.multiselect(
+            "Filter by Risk Level",
+            options=['High', 'Medium', 'Low', 'Unknown'],
+            default=['High', 'Medium', 'Low', 'Unknown']
+        )
+    
+    with col2:
+        countries = st.session_state['country_options']
+        country_filter = st.multiselect(
+            "Filter by Country",
+            options=countries,
+            default=countries[:10]
+        )
+    
+    with col3:
+        min_risk_score = st.slider(
+            "Minimum Risk Score",
+            min_value=0.0,
+            max_value=st.session_state['max_risk'],
+            value=0.0
+        )
+    
+    # Apply filters as one boolean mask, AND-ed in place
+    mask = df['risk_level'].isin(set(risk_filter)).to_numpy(copy=True)
+    mask &= df['country'].isin(set(country_filter)).to_numpy()
+    mask &= df['risk_score'].to_numpy() >= min_risk_score
+    filtered_df = df[mask]
+    
+    # Only the current page is sent to the browser
+    page_count = max(1, -(-len(filtered_df) // TABLE_PAGE_SIZE))
+    page = min(st.session_state.get('dash_page', 0), page_count - 1)
+    st.session_state['dash_page'] = page
+    start = page * TABLE_PAGE_SIZE
+    page_df = filtered_df.iloc[start:start + TABLE_PAGE_SIZE].astype(DISPLAY_DTYPES)
+    
+    first_row = start + 1 if len(page_df) else 0
+    st.write(f"Showing {first_row}–{start + len(page_df)} of {len(filtered_df)} filtered nodes ({len(df)} total)")
+    st.dataframe(page_df, use_container_width=True, height=400, column_order=NODE_COLUMNS)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", on_click=set_table_page, args=(page - 1,),
+                  disabled=page == 0, use_container_width=True)
+    with col2:
+        st.caption(f"Page {page + 1} of {page_count}")
+    with col3:
+        st.button("Next ▶", on_click=set_table_page, args=(page + 1,),
+                  disabled=page >= page_count - 1, use_container_width=True)
 
 
 def render_map_view():
@@ -390,6 +545,24 @@ def render_map_view():
         st.warning("⚠️ No data loaded. Please upload data first in the 'Data Upload' section.")
         return
     
+    render_map()
+    
+    # Map legend
+    st.markdown("""
+    ### 🎨 Map Legend
+    
+    - 🔴 **Red:** High Risk nodes (risk score ≥ 7.0)
+    - 🟠 **Orange:** Medium Risk nodes (risk score 4.0 - 6.9)
+    - 🟢 **Green:** Low Risk nodes (risk score 0.1 - 3.9)
+    - ⚪ **Gray:** Unknown/No risk factors identified
+    
+    Click on markers to see detailed information about each node.
+    """)
+
+
+@fragment
+def render_map():
+    """Render the map and its options; changing them reruns only this part of the page."""
     nodes: List[VPNNode] = st.session_state['nodes']
     
     # Map options
@@ -402,32 +575,31 @@ def render_map_view():
             horizontal=True
         )
     
+    # Leaflet markers do not scale past a few thousand nodes; draw large
+    # datasets as a single WebGL layer instead
+    use_deck = map_type == "Marker Map" and len(nodes) > get_visualizer().deck_threshold
+    
+    use_clusters = True
     with col2:
-        if map_type == "Marker Map":
+        # Unclustered markers are only offered for small datasets
+        if map_type == "Marker Map" and len(nodes) < get_visualizer().cluster_threshold:
             use_clusters = st.checkbox("Use Clustering", value=True)
     
-    # Create map
+    # Create map (cached across reruns for the same dataset and options)
     with st.spinner("Generating map..."):
-        if map_type == "Heat Map":
-            map_obj = visualizer.create_heatmap(nodes)
+        if use_deck:
+            deck_html = build_deck_html(get_nodes_key(), st.session_state['df'])
         else:
-            use_clusters = use_clusters if map_type == "Marker Map" else True
-            map_obj = visualizer.create_world_map(nodes, use_clusters=use_clusters)
-    
-    # Display map
-    st_folium(map_obj, width=1400, height=600)
+            map_html = build_map_html(map_type, use_clusters, get_nodes_key(), nodes, st.session_state['df'])
     
-    # Map legend
-    st.markdown("""
-    ### 🎨 Map Legend
-    
-    - 🔴 **Red:** High Risk nodes (risk score ≥ 7.0)
-    - 🟠 **Orange:** Medium Risk nodes (risk score 4.0 - 6.9)
-    - 🟢 **Green:** Low Risk nodes (risk score 0.1 - 3.9)
-    - ⚪ **Gray:** Unknown/No risk factors identified
-    
-    Click on markers to see detailed information about each node.
-    """)
+    if use_deck:
+        st.caption(f"Showing {format_number(len(nodes))} nodes as a point map (hover for details).")
+        components.html(deck_html, height=600)
+    else:
+        # Display map. Nothing here reads the map state back (bounds/zoom/clicks),
+        # so the cached HTML is embedded as a static component; switch to
+        # st_folium with specific returned_objects if that is needed later.
+        components.html(map_html, height=600)
 
 
 def render_education():
@@ -455,22 +627,6 @@ def render_education():
         education.render_resources()
 
 
-def validate_ip(ip: str) -> bool:
-    """Validate IP address format."""
-    import re
-    ip_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-    if not re.match(ip_pattern, ip):
-        return False
-    
-    # Check octets are 0-255
-    parts = ip.split('.')
-    for part in parts:
-        if int(part) > 255:
-            return False
-    
-    return True
-
-
 def render_ip_lookup():
     """Render IP lookup page."""
     st.title("🔍 IP Lookup")
@@ -613,14 +769,10 @@ def render_ip_lookup():
             
             # Create a simple map
             import folium
+            from streamlit_folium import st_folium
             
             # Determine marker color based on risk
-            if risk_score >= 7:
-                marker_color = 'red'
-            elif risk_score >= 4:
-                marker_color = 'orange'
-            else:
-                marker_color = 'green'
+            marker_color = MARKER_COLORS[risk_level]
             
             m = folium.Map(
                 location=[ip_data.get('latitude'), ip_data.get('longitude')],
@@ -635,7 +787,7 @@ def render_ip_lookup():
                 icon=folium.Icon(color=marker_color, icon='info-sign')
             ).add_to(m)
             
-            st_folium(m, width=700, height=400)
+            st_folium(m, width=700, height=400, returned_objects=[])
         
         # Clear button
         st.markdown("---")
@@ -731,14 +883,13 @@ def main():
     # Quick stats in sidebar if data is loaded
     if 'nodes' in st.session_state and st.session_state['nodes']:
         st.sidebar.markdown("### 📊 Current Dataset")
-        stats = risk_engine.get_statistics(st.session_state['nodes'])
-        st.sidebar.metric("Total Nodes", format_number(stats['total']))
-        st.sidebar.metric("High Risk", format_number(stats['high_risk']))
-        st.sidebar.metric("Avg Risk", stats['average_score'])
+        display = st.session_state['display']
+        st.sidebar.metric("Total Nodes", display['total'])
+        st.sidebar.metric("High Risk", display['high_risk'])
+        st.sidebar.metric("Avg Risk", display['average_score'])
         
         if st.sidebar.button("🗑️ Clear Data"):
-            st.session_state.pop('nodes', None)
-            st.session_state.pop('df', None)
+            clear_dataset()
             st.rerun()
     
     st.sidebar.markdown("---")
@@ -9,8 +9,128 @@ from typing import List, Dict, Optional, Union
 import logging
 from io import StringIO
 import json
-from src.risk_engine import VPNNode
-from src.utils import validate_ip
+import hashlib
+import weakref
+from operator import attrgetter
+import time
+from pathlib import Path
+from dataclasses import fields
+from collections.abc import Sequence
+from src.risk_engine import VPNNode, RiskLevel, RISK_LEVEL_VALUES
+from src.utils import validate_ip_series, get_risk_color, hex_to_rgb, MARKER_COLORS, PYARROW_AVAILABLE
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    
+    # Arrow-backed strings that use NaN for missing values, like object columns
+    try:
+        ARROW_STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        ARROW_STRING_DTYPE = pd.StringDtype('pyarrow_numpy')
+
+
+# Text columns read as strings rather than letting the parser infer dates/numbers
+STRING_COLUMNS = ('ip', 'country', 'region', 'city', 'asn', 'isp', 'first_seen', 'last_seen')
+
+# Numeric columns the Arrow reader also keeps as strings; clean_dataframe
+# coerces them, so a malformed value becomes missing instead of a parse error
+ARROW_STRING_COLUMNS = STRING_COLUMNS + ('port', 'latitude', 'longitude')
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORY_COLUMNS = ('country', 'region', 'city', 'isp', 'asn')
+
+# Columns of a processed node DataFrame, in VPNNode field order
+NODE_COLUMNS = tuple(f.name for f in fields(VPNNode))
+
+# Narrower dtypes for tables sent to the browser
+DISPLAY_DTYPES = {'risk_score': 'float32', 'port': 'Int32'}
+
+# Storage dtypes for node DataFrames; geolocation is only accurate to a few
+# decimal places, ports fit in 16 bits and risk scores are sums of half points
+COMPACT_DTYPES = {'latitude': 'float32', 'longitude': 'float32', 'port': 'UInt16', 'risk_score': 'float32'}
+
+
+def _optional_float(value) -> Optional[float]:
+    """Convert a NumPy scalar to a Python float, mapping missing values to None."""
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def _to_python_values(values: np.ndarray, integer: bool = False) -> list:
+    """Convert a numeric column to Python numbers, mapping missing values to None."""
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce')
+    if integer:
+        numbers = np.trunc(numbers).astype('Int64')
+    return numbers.astype(object).where(numbers.notna(), None).tolist()
+
+
+def _node_columns(df: pd.DataFrame) -> List[np.ndarray]:
+    """Arrays of the NODE_COLUMNS of df, filling missing columns with VPNNode defaults."""
+    defaults = {'risk_score': 0.0, 'risk_level': RiskLevel.UNKNOWN.value}
+    return [
+        df[name].to_numpy() if name in df.columns
+        else np.full(len(df), defaults.get(name), dtype=object)
+        for name in NODE_COLUMNS
+    ]
+
+
+def _build_node(ip, port, country, region, city, asn, isp, first_seen, last_seen,
+                latitude, longitude, risk_score, risk_level, risk_factors) -> VPNNode:
+    """Create a VPNNode from one row of column values."""
+    return VPNNode(
+        ip=ip,
+        port=None if pd.isna(port) else int(port),
+        country=country,
+        region=region,
+        city=city,
+        asn=asn,
+        isp=isp,
+        first_seen=first_seen,
+        last_seen=last_seen,
+        latitude=_optional_float(latitude),
+        longitude=_optional_float(longitude),
+        risk_score=float(risk_score),
+        risk_level=RiskLevel(risk_level),
+        risk_factors=risk_factors
+    )
+
+
+class NodeView(Sequence):
+    """
+    Read-only sequence of VPNNodes backed by the columns of a processed DataFrame.
+    
+    Nodes are created on access instead of being held as one Python object
+    per row. Changes made to a returned node are not written back, so use
+    DataProcessor.dataframe_to_nodes when nodes are enriched or assessed in place.
+    """
+    
+    def __init__(self, df: pd.DataFrame):
+        """
+        Initialize the view.
+        
+        Args:
+            df: Processed node DataFrame
+        """
+        self._columns = _node_columns(df)
+        self._length = len(df)
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        return _build_node(*(column[index] for column in self._columns))
+    
+    def __iter__(self):
+        for values in zip(*self._columns):
+            yield _build_node(*values)
 
 
 class DataProcessor:
@@ -29,7 +149,54 @@ class DataProcessor:
         self.data_config = config.get('data', {})
         self.max_records = self.data_config.get('max_records', 10000)
         self.required_columns = self.data_config.get('required_columns', ['ip'])
+        self.cache_dir = self.data_config.get('cache_dir', '')
+        self.cache_timeout = self.data_config.get('cache_timeout', 3600)
         self.logger = logging.getLogger(__name__)
+        
+        # (weak reference to a DataFrame, its IP validity mask)
+        self._ip_mask_cache = None
+    
+    def _read_csv(self, source) -> pd.DataFrame:
+        """
+        Read CSV data, using the streaming pyarrow parser when available.
+        
+        Text columns are always read as strings so the parser does not have
+        to infer, and possibly misread, their types. With pyarrow they stay in
+        Arrow memory instead of becoming one Python object per cell, and port
+        and coordinates are read as strings too, to be coerced by
+        clean_dataframe.
+        
+        Args:
+            source: File path or file-like object
+            
+        Returns:
+            DataFrame with at most max_records rows
+        """
+        if not PYARROW_AVAILABLE:
+            return pd.read_csv(
+                source, nrows=self.max_records, dtype={col: str for col in STRING_COLUMNS}
+            )
+        
+        convert_options = pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in ARROW_STRING_COLUMNS},
+            strings_can_be_null=True
+        )
+        read_options = pa_csv.ReadOptions(block_size=8 << 20)
+        reader = pa_csv.open_csv(source, read_options=read_options, convert_options=convert_options)
+        
+        # Stop parsing once max_records rows are in, like nrows does for pandas
+        batches = []
+        rows = 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= self.max_records:
+                break
+        
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        return table.slice(0, self.max_records).to_pandas(
+            types_mapper={pa.string(): ARROW_STRING_DTYPE}.get
+        )
     
     def load_csv(self, file_path: str) -> pd.DataFrame:
         """
@@ -42,7 +209,7 @@ class DataProcessor:
             DataFrame containing the data
         """
         try:
-            df = pd.read_csv(file_path, nrows=self.max_records)
+            df = self._read_csv(file_path)
             self.logger.info(f"Loaded {len(df)} records from CSV")
             return df
         except Exception as e:
@@ -60,13 +227,37 @@ class DataProcessor:
             DataFrame containing the data
         """
         try:
-            df = pd.read_csv(uploaded_file, nrows=self.max_records)
+            df = self._read_csv(uploaded_file)
             self.logger.info(f"Loaded {len(df)} records from uploaded CSV")
             return df
         except Exception as e:
             self.logger.error(f"Failed to load uploaded CSV: {e}")
             raise
     
+    def _json_to_dataframe(self, raw: Union[bytes, str]) -> pd.DataFrame:
+        """
+        Parse JSON node data, using orjson when available.
+        
+        Args:
+            raw: JSON document
+            
+        Returns:
+            DataFrame with at most max_records rows
+        """
+        data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+        
+        # Handle different JSON structures
+        if isinstance(data, dict) and 'nodes' in data:
+            data = data['nodes']
+        elif not isinstance(data, list):
+            data = [data]
+        
+        # Drop surplus records before building the frame; only column-oriented
+        # 'nodes' mappings still need truncating afterwards
+        if isinstance(data, list):
+            return pd.DataFrame(data[:self.max_records])
+        return pd.DataFrame(data).head(self.max_records)
+    
     def load_json(self, file_path: str) -> pd.DataFrame:
         """
         Load data from JSON file.
@@ -78,18 +269,9 @@ class DataProcessor:
             DataFrame containing the data
         """
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            # Handle different JSON structures
-            if isinstance(data, list):
-                df = pd.DataFrame(data)
-            elif isinstance(data, dict) and 'nodes' in data:
-                df = pd.DataFrame(data['nodes'])
-            else:
-                df = pd.DataFrame([data])
+            with open(file_path, 'rb') as f:
+                df = self._json_to_dataframe(f.read())
             
-            df = df.head(self.max_records)
             self.logger.info(f"Loaded {len(df)} records from JSON")
             return df
         except Exception as e:
@@ -107,16 +289,7 @@ class DataProcessor:
             DataFrame containing the data
         """
         try:
-            data = json.load(uploaded_file)
-            
-            if isinstance(data, list):
-                df = pd.DataFrame(data)
-            elif isinstance(data, dict) and 'nodes' in data:
-                df = pd.DataFrame(data['nodes'])
-            else:
-                df = pd.DataFrame([data])
-            
-            df = df.head(self.max_records)
+            df = self._json_to_dataframe(uploaded_file.read())
             self.logger.info(f"Loaded {len(df)} records from uploaded JSON")
             return df
         except Exception as e:
@@ -146,13 +319,34 @@ class DataProcessor:
         
         # Validate IP addresses
         if 'ip' in df.columns:
-            invalid_ips = df[~df['ip'].apply(validate_ip)]
-            if not invalid_ips.empty:
-                errors.append(f"Found {len(invalid_ips)} invalid IP addresses")
+            invalid_count = int((~self._valid_ip_mask(df)).sum())
+            if invalid_count:
+                errors.append(f"Found {invalid_count} invalid IP addresses")
         
         is_valid = len(errors) == 0
         return is_valid, errors
     
+    def _valid_ip_mask(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Validate the 'ip' column of df.
+        
+        The mask of the last validated frame is kept, so validate_dataframe
+        followed by clean_dataframe on the same frame validates only once.
+        
+        Args:
+            df: DataFrame with an 'ip' column
+            
+        Returns:
+            Boolean array, True for rows with a valid IP
+        """
+        cached = self._ip_mask_cache
+        if cached is not None and cached[0]() is df and len(cached[1]) == len(df):
+            return cached[1]
+        
+        mask = validate_ip_series(df['ip']).to_numpy()
+        self._ip_mask_cache = (weakref.ref(df), mask)
+        return mask
+    
     def clean_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Clean and standardize DataFrame.
@@ -163,14 +357,15 @@ class DataProcessor:
         Returns:
             Cleaned DataFrame
         """
-        df = df.copy()
-        
-        # Remove rows with invalid IPs
+        # Remove rows with invalid IPs and duplicates based on IP with a single
+        # row selection. Repeats of an IP are exactly as valid as its first
+        # occurrence, so the two masks can be combined. The selection already
+        # produces a new frame; otherwise a shallow copy is enough because
+        # columns below are only ever replaced, never modified in place.
         if 'ip' in df.columns:
-            df = df[df['ip'].apply(validate_ip)]
-        
-        # Remove duplicates based on IP
-        df = df.drop_duplicates(subset=['ip'], keep='first')
+            df = df[self._valid_ip_mask(df) & ~df['ip'].duplicated(keep='first').to_numpy()]
+        else:
+            df = df.copy(deep=False)
         
         # Standardize column names
         column_mapping = {
@@ -185,24 +380,27 @@ class DataProcessor:
             'Longitude': 'longitude'
         }
         
-        for old_name, new_name in column_mapping.items():
-            if old_name in df.columns:
-                df = df.rename(columns={old_name: new_name})
+        df.columns = [column_mapping.get(col, col) for col in df.columns]
         
-        # Convert port to integer where possible
+        # Convert port to a nullable integer in one pass; 0 and out-of-range
+        # ports become missing
         if 'port' in df.columns:
-            df['port'] = pd.to_numeric(df['port'], errors='coerce').fillna(0).astype(int)
-            df.loc[df['port'] == 0, 'port'] = None
+            port = np.trunc(pd.to_numeric(df['port'], errors='coerce'))
+            df['port'] = port.where((port > 0) & (port <= 65535)).astype(COMPACT_DTYPES['port'])
         
-        # Convert lat/lon to float
-        for col in ['latitude', 'longitude']:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+        # Convert lat/lon to float; compact_dataframe coerces and downcasts
+        # them in a single pass
+        df = self.compact_dataframe(df)
         
         # Strip whitespace from string columns
-        string_columns = df.select_dtypes(include=['object']).columns
-        for col in string_columns:
-            df[col] = df[col].str.strip() if df[col].dtype == 'object' else df[col]
+        string_columns = df.select_dtypes(include=['object', 'string']).columns
+        if len(string_columns):
+            df[string_columns] = df[string_columns].apply(lambda col: col.str.strip())
+        
+        # Repeated values are stored once per category
+        for col in CATEGORY_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
         
         self.logger.info(f"Cleaned DataFrame: {len(df)} records remaining")
         return df
@@ -211,33 +409,26 @@ class DataProcessor:
         """
         Convert DataFrame to list of VPNNode objects.
         
+        Nodes start unassessed; any risk columns in df are ignored.
+        
         Args:
             df: DataFrame containing node data
             
         Returns:
             List of VPNNode objects
         """
-        nodes = []
-        
-        for _, row in df.iterrows():
-            try:
-                node = VPNNode(
-                    ip=row.get('ip'),
-                    port=row.get('port'),
-                    country=row.get('country'),
-                    region=row.get('region'),
-                    city=row.get('city'),
-                    asn=row.get('asn'),
-                    isp=row.get('isp'),
-                    first_seen=row.get('first_seen'),
-                    last_seen=row.get('last_seen'),
-                    latitude=row.get('latitude'),
-                    longitude=row.get('longitude')
-                )
-                nodes.append(node)
-            except Exception as e:
-                self.logger.warning(f"Failed to create node for IP {row.get('ip')}: {e}")
-                continue
+        # Convert whole columns to node field values up front so the row loop
+        # only constructs nodes; iterrows would build a Series per row
+        columns = dict(zip(NODE_COLUMNS, _node_columns(df)))
+        for name in ('port', 'latitude', 'longitude'):
+            columns[name] = _to_python_values(columns[name], integer=name == 'port')
+        
+        # Risk fields keep their VPNNode defaults until the node is assessed
+        for name in ('risk_score', 'risk_level', 'risk_factors'):
+            del columns[name]
+        
+        # Columns follow the VPNNode field order
+        nodes = [VPNNode(*values) for values in zip(*columns.values())]
         
         self.logger.info(f"Created {len(nodes)} VPNNode objects")
         return nodes
@@ -252,10 +443,151 @@ class DataProcessor:
         Returns:
             DataFrame containing node data
         """
-        data = [node.to_dict() for node in nodes]
-        df = pd.DataFrame(data)
+        # Gather each field into its own column in one pass instead of
+        # building an intermediate dict per node
+        if nodes:
+            get_fields = attrgetter(*NODE_COLUMNS)
+            columns = dict(zip(NODE_COLUMNS, map(list, zip(*map(get_fields, nodes)))))
+            columns['risk_level'] = list(map(RISK_LEVEL_VALUES.__getitem__, columns['risk_level']))
+        else:
+            columns = {col: [] for col in NODE_COLUMNS}
+        df = self.compact_dataframe(pd.DataFrame(columns))
+        return self.add_display_columns(df)
+    
+    def compact_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Downcast coordinate and port columns to COMPACT_DTYPES.
+        
+        Args:
+            df: Node DataFrame
+            
+        Returns:
+            The same DataFrame with its present columns downcast
+        """
+        for col, dtype in COMPACT_DTYPES.items():
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        return df
+    
+    def add_display_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Precompute per-node map colors from the risk level column.
+        
+        Adds 'marker_color' (Folium color name) and 'risk_rgb' ([r, g, b]
+        from the configured risk colors) so map builders do not branch on
+        the risk level for every node.
+        
+        Args:
+            df: DataFrame with a 'risk_level' column
+            
+        Returns:
+            The same DataFrame with the color columns added
+        """
+        if df.empty:
+            df['marker_color'] = pd.Series(dtype=object)
+            df['risk_rgb'] = pd.Series(dtype=object)
+            return df
+        
+        risk_level = df['risk_level'].astype(str)
+        risk_rgb = {
+            level: hex_to_rgb(get_risk_color(level, self.config)) for level in MARKER_COLORS
+        }
+        df['marker_color'] = risk_level.map(MARKER_COLORS)
+        df['risk_rgb'] = risk_level.map(risk_rgb)
+        return df
+    
+    def get_cache_key(self, content: bytes, *options) -> str:
+        """
+        Compute the cache key for a processed upload.
+        
+        Args:
+            content: Raw bytes of the uploaded file
+            *options: Processing options that affect the result
+            
+        Returns:
+            Hex digest identifying the file, options, record limit and risk rules
+        """
+        digest = hashlib.blake2b(content, digest_size=16)
+        digest.update(repr((options, self.max_records, self.config.get('risk_engine'))).encode())
+        return digest.hexdigest()
+    
+    def get_dataframe_key(self, df: pd.DataFrame) -> str:
+        """
+        Compute a content fingerprint of a processed node DataFrame.
+        
+        Rows are hashed column-wise by pandas, so identical data yields the
+        same key regardless of which objects hold it.
+        
+        Args:
+            df: Processed node DataFrame
+            
+        Returns:
+            Hex digest of the DataFrame contents
+        """
+        frame = df.drop(columns=['risk_factors', 'risk_rgb'], errors='ignore')
+        digest = hashlib.blake2b(repr(df.shape).encode(), digest_size=16)
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+        
+        if 'risk_factors' in df.columns:
+            factors = df['risk_factors'].map(lambda f: '; '.join(f) if isinstance(f, list) else '')
+            digest.update(pd.util.hash_pandas_object(factors, index=False).to_numpy().tobytes())
+        
+        return digest.hexdigest()
+    
+    def _cache_path(self, cache_key: str) -> Optional[Path]:
+        """Path of the cached Parquet file, or None if disk caching is disabled."""
+        if not self.cache_dir or not PYARROW_AVAILABLE:
+            return None
+        return Path(self.cache_dir).expanduser() / f"{cache_key}.parquet"
+    
+    def load_cached_dataframe(self, cache_key: str) -> Optional[pd.DataFrame]:
+        """
+        Load a processed node DataFrame from the on-disk cache.
+        
+        Args:
+            cache_key: Key from get_cache_key
+            
+        Returns:
+            Cached DataFrame, or None if missing, expired or unreadable
+        """
+        path = self._cache_path(cache_key)
+        if path is None or not path.exists():
+            return None
+        
+        if time.time() - path.stat().st_mtime > self.cache_timeout:
+            return None
+        
+        try:
+            df = pd.read_parquet(path, engine='pyarrow')
+        except Exception as e:
+            self.logger.warning(f"Failed to read cached dataset {path}: {e}")
+            return None
+        
+        # Parquet list columns come back as arrays
+        df['risk_factors'] = df['risk_factors'].map(list)
+        self.logger.info(f"Loaded {len(df)} records from cache")
         return df
     
+    def save_cached_dataframe(self, cache_key: str, df: pd.DataFrame):
+        """
+        Save a processed node DataFrame to the on-disk cache.
+        
+        Caching is best effort; failures are logged and otherwise ignored.
+        
+        Args:
+            cache_key: Key from get_cache_key
+            df: Processed node DataFrame
+        """
+        path = self._cache_path(cache_key)
+        if path is None:
+            return
+        
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df[list(NODE_COLUMNS)].to_parquet(path, engine='pyarrow', compression='zstd', index=False)
+        except Exception as e:
+            self.logger.warning(f"Failed to cache dataset to {path}: {e}")
+    
     def get_summary_statistics(self, df: pd.DataFrame) -> Dict:
         """
         Calculate summary statistics for the dataset.
@@ -275,17 +607,64 @@ class DataProcessor:
         
         # Most common countries
         if 'country' in df.columns:
-            top_countries = df['country'].value_counts().head(10).to_dict()
-            stats['top_countries'] = top_countries
+            stats['top_countries'] = self._top_counts(df['country'], 10)
         
         # Most common ports
         if 'port' in df.columns:
-            top_ports = df['port'].value_counts().head(10).to_dict()
-            stats['top_ports'] = top_ports
+            stats['top_ports'] = self._top_counts(df['port'], 10)
         
         # Most common ISPs
         if 'isp' in df.columns:
-            top_isps = df['isp'].value_counts().head(10).to_dict()
-            stats['top_isps'] = top_isps
+            stats['top_isps'] = self._top_counts(df['isp'], 10)
         
         return stats
+    
+    @staticmethod
+    def _top_counts(series: pd.Series, n: int) -> Dict:
+        """
+        Count the n most common values of a column.
+        
+        Categorical columns are counted with one bincount over their integer
+        codes, so only the categories are sorted, not the rows.
+        
+        Args:
+            series: Column to count
+            n: Number of values to return
+            
+        Returns:
+            Dictionary mapping value to count, most common first
+        """
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series.value_counts().head(n).to_dict()
+        
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        top = np.argsort(-counts, kind='stable')[:n]
+        return dict(zip(series.cat.categories[top], counts[top].tolist()))
+    
+    def get_chart_aggregates(self, df: pd.DataFrame, top_n: int = 20, bins: int = 20) -> Dict:
+        """
+        Precompute the counts behind the dashboard distribution charts.
+        
+        Args:
+            df: Processed node DataFrame
+            top_n: Number of top countries and ports to keep
+            bins: Number of risk score histogram bins
+            
+        Returns:
+            Dictionary of counts accepted by the Visualizer chart methods
+        """
+        country = df['country'].astype(object)
+        country = country.where(country.notna() & (country != ''), 'Unknown')
+        
+        port = df['port']
+        port = port[port.notna() & (port != 0)].astype(int)
+        
+        return {
+            'risk_level_counts': df['risk_level'].astype(str).value_counts().reindex(
+                [level.value for level in RiskLevel], fill_value=0
+            ),
+            'country_top': country.value_counts().head(top_n),
+            'port_top': port.value_counts().head(top_n),
+            'risk_score_hist': np.histogram(df['risk_score'].to_numpy(dtype=float), bins=bins),
+        }
@@ -4,10 +4,127 @@ Performs IP geolocation, ASN lookups, and metadata enrichment.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Iterator, Tuple
 import time
-from src.risk_engine import VPNNode
+import json
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from src.risk_engine import VPNNode, RiskEngine
+
+try:
+    import geoip2.database
+    import geoip2.errors
+    GEOIP2_AVAILABLE = True
+except ImportError:
+    GEOIP2_AVAILABLE = False
+
+
+# ip-api.com batch endpoint (free, no key required, up to 100 IPs per request)
+IP_API_BATCH_URL = "http://ip-api.com/batch"
+IP_API_BATCH_SIZE = 100
+IP_API_FIELDS = "status,query,countryCode,regionName,city,lat,lon,as,isp"
+
+# SQLite file in the data cache directory holding IP lookup results
+IP_CACHE_FILE = "ip_lookups.sqlite3"
+
+# Lookup results kept in memory per GeoAnalyzer, in front of the SQLite cache
+MEMORY_CACHE_SIZE = 50000
+
+# Concurrent batch requests, also the size of the HTTP connection pool
+MAX_CONCURRENT_REQUESTS = 8
+
+# IPInfo batch endpoint (token required)
+IPINFO_BATCH_URL = "https://ipinfo.io/batch"
+IPINFO_BATCH_SIZE = 100
+
+# Documented ip-api.com request limits per minute
+IP_API_RATE_LIMIT = 45
+IP_API_BATCH_RATE_LIMIT = 15
+
+# Approximate center coordinates for common countries
+COUNTRY_COORDINATES = {
+    'US': (37.0902, -95.7129),
+    'GB': (55.3781, -3.4360),
+    'DE': (51.1657, 10.4515),
+    'FR': (46.2276, 2.2137),
+    'NL': (52.1326, 5.2913),
+    'CA': (56.1304, -106.3468),
+    'AU': (-25.2744, 133.7751),
+    'JP': (36.2048, 138.2529),
+    'CN': (35.8617, 104.1954),
+    'IN': (20.5937, 78.9629),
+    'BR': (-14.2350, -51.9253),
+    'RU': (61.5240, 105.3188),
+    'SG': (1.3521, 103.8198),
+    'EU': (50.8503, 4.3517),  # Brussels as generic EU
+}
+
+# The same coordinates as parallel arrays for column-wise lookups; the trailing
+# (0, 0) entry is what unknown codes (indexer -1) resolve to
+COUNTRY_CODES = pd.Index(list(COUNTRY_COORDINATES))
+COUNTRY_LAT = np.array([lat for lat, _ in COUNTRY_COORDINATES.values()] + [0.0])
+COUNTRY_LON = np.array([lon for _, lon in COUNTRY_COORDINATES.values()] + [0.0])
+
+
+def _first_octet(ip: str) -> int:
+    """First octet of an IPv4 address; raises OSError if ip is not one."""
+    return socket.inet_aton(ip)[0]
+
+
+def _first_octets(ips: List[str]) -> np.ndarray:
+    """First octet of each IPv4 address as a float, NaN where it cannot be parsed."""
+    octets = np.full(len(ips), np.nan)
+    for i, ip in enumerate(ips):
+        try:
+            octets[i] = socket.inet_aton(ip)[0]
+        except (OSError, TypeError, ValueError):
+            pass
+    return octets
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    
+    Allows bursts of up to ``burst`` requests and refills at ``rate`` tokens
+    per second, so callers only wait once the bucket is empty.
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize a full bucket.
+        
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            
+            # Reserve the token now; callers queued behind this one wait longer
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        
+        if wait > 0:
+            time.sleep(wait)
 
 
 class GeoAnalyzer:
@@ -28,9 +145,46 @@ class GeoAnalyzer:
         self.ipinfo_token = self.api_config.get('ipinfo_token', '')
         self.rate_limit = self.api_config.get('rate_limit', {})
         self.requests_count = 0
-        self.last_request_time = time.time()
         self.logger = logging.getLogger(__name__)
         
+        # Shared session so lookups reuse keep-alive connections. Rate-limited
+        # (429) and unavailable responses are retried after the server's
+        # Retry-After delay or an exponential backoff.
+        self.session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 503),
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=MAX_CONCURRENT_REQUESTS,
+            pool_maxsize=MAX_CONCURRENT_REQUESTS,
+            max_retries=retry
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # IP lookup cache: in memory, plus a SQLite file in the dataset cache
+        # directory when disk caching is enabled
+        data_config = config.get('data', {})
+        self.cache_dir = data_config.get('cache_dir', '')
+        self.cache_timeout = data_config.get('cache_timeout', 3600)
+        self._memory_cache: Dict[str, Tuple[float, Dict]] = {}
+        self._cache_db = None
+        self._cache_lock = threading.Lock()
+        
+        # One rate limiter per endpoint; the configured limit applies to IPInfo
+        ipinfo_per_minute = max(self.rate_limit.get('requests_per_minute', 50), 1)
+        self._ipinfo_bucket = TokenBucket(ipinfo_per_minute / 60, ipinfo_per_minute)
+        self._ip_api_bucket = TokenBucket(IP_API_RATE_LIMIT / 60, IP_API_RATE_LIMIT)
+        self._ip_api_batch_bucket = TokenBucket(IP_API_BATCH_RATE_LIMIT / 60, IP_API_BATCH_RATE_LIMIT)
+        
+        # Optional local geolocation database
+        self.maxmind_reader = self._open_maxmind(self.api_config.get('maxmind_db', ''))
+        
         # Known country code to name mapping (subset)
         self.country_names = {
             'US': 'United States', 'GB': 'United Kingdom', 'DE': 'Germany',
@@ -45,18 +199,146 @@ class GeoAnalyzer:
             'MX': 'Mexico', 'AR': 'Argentina', 'ZA': 'South Africa'
         }
     
-    def _respect_rate_limit(self):
-        """Implement rate limiting for API requests."""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
+    def _open_maxmind(self, db_path: str):
+        """Open the local GeoLite2 City database, or return None if it is not configured."""
+        if not db_path:
+            return None
         
-        # Simple rate limiting: wait at least 0.1 seconds between requests
-        if time_since_last_request < 0.1:
-            time.sleep(0.1 - time_since_last_request)
+        if not GEOIP2_AVAILABLE:
+            self.logger.warning("maxmind_db is set but geoip2 is not installed")
+            return None
         
-        self.last_request_time = time.time()
+        try:
+            # MODE_AUTO uses the libmaxminddb C extension when it is installed
+            return geoip2.database.Reader(str(Path(db_path).expanduser()))
+        except Exception as e:
+            self.logger.warning(f"Failed to open MaxMind database {db_path}: {e}")
+            return None
+    
+    def _respect_rate_limit(self, bucket: TokenBucket):
+        """Wait for the endpoint's rate limiter before an API request."""
+        bucket.acquire()
         self.requests_count += 1
     
+    def lookup_ip_maxmind(self, ip: str) -> Optional[Dict]:
+        """
+        Lookup IP information in the local MaxMind database.
+        
+        Args:
+            ip: IP address to lookup
+            
+        Returns:
+            Dictionary containing IP information or None
+        """
+        if self.maxmind_reader is None:
+            return None
+        
+        try:
+            response = self.maxmind_reader.city(ip)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            return None
+        
+        if response.location.latitude is None or response.location.longitude is None:
+            return None
+        
+        # The City database has no ASN or ISP data
+        return {
+            'country': response.country.iso_code,
+            'region': response.subdivisions.most_specific.name,
+            'city': response.city.name,
+            'latitude': response.location.latitude,
+            'longitude': response.location.longitude,
+            'asn': None,
+            'isp': None
+        }
+    
+    def _open_cache(self) -> Optional[sqlite3.Connection]:
+        """Open the persistent lookup cache, or return None if disk caching is disabled."""
+        if self._cache_db is None and self.cache_dir:
+            try:
+                path = Path(self.cache_dir).expanduser()
+                path.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(path / IP_CACHE_FILE, check_same_thread=False)
+                db.execute("CREATE TABLE IF NOT EXISTS ip_cache (ip TEXT PRIMARY KEY, data TEXT, ts REAL)")
+                self._cache_db = db
+            except (OSError, sqlite3.Error) as e:
+                self.logger.warning(f"IP lookup cache disabled: {e}")
+                self.cache_dir = ''
+        return self._cache_db
+    
+    def _cached_lookups(self, ips: List[str]) -> Dict[str, Dict]:
+        """
+        Read unexpired lookup results from the memory and persistent caches.
+        
+        Args:
+            ips: IP addresses to read
+            
+        Returns:
+            Dictionary mapping each cached IP to its information
+        """
+        if not ips:
+            return {}
+        
+        keys = {ip.strip().lower(): ip for ip in ips}
+        cutoff = time.time() - self.cache_timeout
+        results = {}
+        
+        with self._cache_lock:
+            for key, ip in keys.items():
+                entry = self._memory_cache.get(key)
+                if entry is not None and entry[0] > cutoff:
+                    results[ip] = entry[1]
+        
+        key_list = [key for key, ip in keys.items() if ip not in results]
+        db = self._open_cache()
+        if db is None or not key_list:
+            return results
+        
+        with self._cache_lock:
+            # Stay below SQLite's limit on query parameters
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                rows = db.execute(
+                    f"SELECT ip, data, ts FROM ip_cache WHERE ts > ? AND ip IN ({','.join('?' * len(chunk))})",
+                    [cutoff, *chunk]
+                )
+                for key, data, ts in rows:
+                    results[keys[key]] = ip_data = json.loads(data)
+                    self._remember(key, ip_data, ts)
+        
+        return results
+    
+    def _remember(self, key: str, ip_data: Dict, ts: float):
+        """Add one result to the memory cache; call with _cache_lock held."""
+        self._memory_cache.pop(key, None)
+        if len(self._memory_cache) >= MEMORY_CACHE_SIZE:
+            # Dicts keep insertion order, so the first entry is the oldest
+            del self._memory_cache[next(iter(self._memory_cache))]
+        self._memory_cache[key] = (ts, ip_data)
+    
+    def _store_lookups(self, ip_data: Dict[str, Dict]):
+        """Write lookup results to the caches; disk failures are only logged."""
+        if not ip_data:
+            return
+        
+        now = time.time()
+        with self._cache_lock:
+            for ip, data in ip_data.items():
+                self._remember(ip.strip().lower(), data, now)
+        
+        db = self._open_cache()
+        if db is None:
+            return
+        
+        try:
+            with self._cache_lock, db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO ip_cache (ip, data, ts) VALUES (?, ?, ?)",
+                    [(ip.strip().lower(), json.dumps(data), now) for ip, data in ip_data.items()]
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Failed to cache IP lookups: {e}")
+    
     def lookup_ip_ipinfo(self, ip: str) -> Optional[Dict]:
         """
         Lookup IP information using IPInfo API.
@@ -70,25 +352,22 @@ class GeoAnalyzer:
         if not self.ipinfo_token:
             return None
         
+        cached = self._cached_lookups([ip])
+        if cached:
+            return cached[ip]
+        
         try:
-            self._respect_rate_limit()
+            self._respect_rate_limit(self._ipinfo_bucket)
             
             url = f"https://ipinfo.io/{ip}"
             headers = {'Authorization': f'Bearer {self.ipinfo_token}'}
             
-            response = requests.get(url, headers=headers, timeout=5)
+            response = self.session.get(url, headers=headers, timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
-                return {
-                    'country': data.get('country'),
-                    'region': data.get('region'),
-                    'city': data.get('city'),
-                    'latitude': float(data.get('loc', '0,0').split(',')[0]),
-                    'longitude': float(data.get('loc', '0,0').split(',')[1]),
-                    'asn': data.get('org', '').split()[0] if data.get('org') else None,
-                    'isp': data.get('org', '')
-                }
+                ip_data = self._parse_ipinfo(response.json())
+                self._store_lookups({ip: ip_data})
+                return ip_data
             else:
                 self.logger.warning(f"IPInfo lookup failed for {ip}: {response.status_code}")
                 return None
@@ -97,6 +376,19 @@ class GeoAnalyzer:
             self.logger.error(f"IPInfo lookup error for {ip}: {e}")
             return None
     
+    @staticmethod
+    def _parse_ipinfo(data: Dict) -> Dict:
+        """Convert an IPInfo response record to the internal format."""
+        return {
+            'country': data.get('country'),
+            'region': data.get('region'),
+            'city': data.get('city'),
+            'latitude': float(data.get('loc', '0,0').split(',')[0]),
+            'longitude': float(data.get('loc', '0,0').split(',')[1]),
+            'asn': data.get('org', '').split()[0] if data.get('org') else None,
+            'isp': data.get('org', '')
+        }
+    
     def lookup_ip_free_api(self, ip: str) -> Optional[Dict]:
         """
         Lookup IP information using free IP API (no key required).
@@ -107,33 +399,155 @@ class GeoAnalyzer:
         Returns:
             Dictionary containing IP information or None
         """
+        cached = self._cached_lookups([ip])
+        if cached:
+            return cached[ip]
+        
         try:
-            self._respect_rate_limit()
+            ip_data = self._fetch_free_api(ip)
+            if ip_data:
+                self._store_lookups({ip: ip_data})
+            return ip_data
+        except Exception as e:
+            self.logger.error(f"Free API lookup error for {ip}: {e}")
+            return None
+    
+    def _fetch_free_api(self, ip: str) -> Optional[Dict]:
+        """
+        Query ip-api.com for a single IP.
+        
+        Transient failures raise; an IP the API cannot resolve returns None.
+        """
+        self._respect_rate_limit(self._ip_api_bucket)
+        
+        # Using ip-api.com (free, no key required, 45 requests/minute)
+        url = f"http://ip-api.com/json/{ip}"
+        
+        response = self.session.get(url, timeout=5)
+        response.raise_for_status()
+        
+        data = response.json()
+        if data.get('status') == 'success':
+            return self._parse_ip_api(data)
+        return None
+    
+    @staticmethod
+    def _parse_ip_api(data: Dict) -> Dict:
+        """Convert an ip-api.com response record to the internal format."""
+        return {
+            'country': data.get('countryCode'),
+            'region': data.get('regionName'),
+            'city': data.get('city'),
+            'latitude': data.get('lat'),
+            'longitude': data.get('lon'),
+            'asn': data.get('as', '').split()[0] if data.get('as') else None,
+            'isp': data.get('isp', '')
+        }
+    
+    def _batch_lookup(self, ips: List[str], max_requests: int) -> Tuple[Dict[str, Dict], int]:
+        """
+        Lookup many IPs through the batch endpoints.
+        
+        With an IPInfo token, IPs are resolved through the IPInfo batch
+        endpoint first and any it cannot resolve are retried on ip-api.com,
+        mirroring enrich_node. Requests to both endpoints count towards
+        max_requests; IPs beyond the budget are not looked up.
+        
+        Args:
+            ips: IP addresses to lookup
+            max_requests: Maximum number of batch requests to make
+            
+        Returns:
+            Tuple of (dictionary mapping each successfully resolved IP to its
+            information, number of batch requests made)
+        """
+        results = {}
+        requests_made = 0
+        
+        if self.ipinfo_token:
+            batch = ips[:max_requests * IPINFO_BATCH_SIZE]
+            if batch:
+                results.update(self._run_batches(
+                    self._fetch_ipinfo_batch, batch, IPINFO_BATCH_SIZE, self._ipinfo_bucket
+                ))
+                requests_made += -(-len(batch) // IPINFO_BATCH_SIZE)
+            ips = [ip for ip in ips if ip not in results]
+        
+        batch = ips[:(max_requests - requests_made) * IP_API_BATCH_SIZE]
+        if batch:
+            results.update(self._run_batches(
+                self._fetch_batch, batch, IP_API_BATCH_SIZE, self._ip_api_batch_bucket
+            ))
+            requests_made += -(-len(batch) // IP_API_BATCH_SIZE)
+        
+        self._store_lookups(results)
+        return results, requests_made
+    
+    def _run_batches(self, fetch, ips: List[str], batch_size: int,
+                     bucket: TokenBucket) -> Dict[str, Dict]:
+        """Send IPs to fetch in chunks of batch_size, requesting the chunks concurrently."""
+        chunks = [ips[i:i + batch_size] for i in range(0, len(ips), batch_size)]
+        results = {}
+        
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            futures = []
+            for chunk in chunks:
+                self._respect_rate_limit(bucket)
+                futures.append(executor.submit(fetch, chunk))
             
-            # Using ip-api.com (free, no key required, 45 requests/minute)
-            url = f"http://ip-api.com/json/{ip}"
+            for future in futures:
+                results.update(future.result())
+        
+        return results
+    
+    def _fetch_ipinfo_batch(self, ips: List[str]) -> Dict[str, Dict]:
+        """POST one chunk of IPs to the IPInfo batch endpoint."""
+        try:
+            response = self.session.post(
+                IPINFO_BATCH_URL,
+                headers={'Authorization': f'Bearer {self.ipinfo_token}'},
+                json=[f"{ip}/json" for ip in ips],
+                timeout=10
+            )
             
-            response = requests.get(url, timeout=5)
+            if response.status_code != 200:
+                self.logger.warning(f"IPInfo batch lookup failed for {len(ips)} IPs: {response.status_code}")
+                return {}
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data.get('status') == 'success':
-                    return {
-                        'country': data.get('countryCode'),
-                        'region': data.get('regionName'),
-                        'city': data.get('city'),
-                        'latitude': data.get('lat'),
-                        'longitude': data.get('lon'),
-                        'asn': data.get('as', '').split()[0] if data.get('as') else None,
-                        'isp': data.get('isp', '')
-                    }
+            # Keys echo the requested paths; failed or bogon lookups have no location
+            results = {}
+            for path, data in response.json().items():
+                if isinstance(data, dict) and 'loc' in data:
+                    results[path.split('/')[0]] = self._parse_ipinfo(data)
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"IPInfo batch lookup error for {len(ips)} IPs: {e}")
+            return {}
+    
+    def _fetch_batch(self, ips: List[str]) -> Dict[str, Dict]:
+        """POST one chunk of IPs to the ip-api.com batch endpoint."""
+        try:
+            response = self.session.post(
+                IP_API_BATCH_URL,
+                params={'fields': IP_API_FIELDS},
+                json=[{'query': ip} for ip in ips],
+                timeout=10
+            )
             
-            return None
+            if response.status_code != 200:
+                self.logger.warning(f"Batch lookup failed for {len(ips)} IPs: {response.status_code}")
+                return {}
+            
+            return {
+                item['query']: self._parse_ip_api(item)
+                for item in response.json()
+                if item.get('status') == 'success'
+            }
         
         except Exception as e:
-            self.logger.error(f"Free API lookup error for {ip}: {e}")
-            return None
+            self.logger.error(f"Batch lookup error for {len(ips)} IPs: {e}")
+            return {}
     
     def enrich_node(self, node: VPNNode, use_api: bool = False) -> VPNNode:
         """
@@ -154,29 +568,34 @@ class GeoAnalyzer:
             # Use fallback/mock data for demonstration
             return self._apply_fallback_data(node)
         
-        # Try API lookup
-        ip_data = None
+        # Try the local database, then API lookup
+        ip_data = self.lookup_ip_maxmind(node.ip)
         
-        if self.ipinfo_token:
+        if not ip_data and self.ipinfo_token:
             ip_data = self.lookup_ip_ipinfo(node.ip)
         
         if not ip_data:
             ip_data = self.lookup_ip_free_api(node.ip)
         
         if ip_data:
-            node.country = node.country or ip_data.get('country')
-            node.region = node.region or ip_data.get('region')
-            node.city = node.city or ip_data.get('city')
-            node.latitude = node.latitude or ip_data.get('latitude')
-            node.longitude = node.longitude or ip_data.get('longitude')
-            node.asn = node.asn or ip_data.get('asn')
-            node.isp = node.isp or ip_data.get('isp')
+            self._merge_ip_data(node, ip_data)
         else:
             # Use fallback if API lookup fails
             node = self._apply_fallback_data(node)
         
         return node
     
+    def _merge_ip_data(self, node: VPNNode, ip_data: Dict) -> VPNNode:
+        """Fill the node's missing fields from looked-up IP information."""
+        node.country = node.country or ip_data.get('country')
+        node.region = node.region or ip_data.get('region')
+        node.city = node.city or ip_data.get('city')
+        node.latitude = node.latitude or ip_data.get('latitude')
+        node.longitude = node.longitude or ip_data.get('longitude')
+        node.asn = node.asn or ip_data.get('asn')
+        node.isp = node.isp or ip_data.get('isp')
+        return node
+    
     def _apply_fallback_data(self, node: VPNNode) -> VPNNode:
         """
         Apply fallback/estimated data when API is not available.
@@ -190,7 +609,7 @@ class GeoAnalyzer:
         # Simple heuristic: use IP's first octet to estimate region
         # This is for demonstration only and not accurate
         try:
-            first_octet = int(node.ip.split('.')[0])
+            first_octet = _first_octet(node.ip)
             
             # Rough regional mapping (demonstration only)
             if not node.country:
@@ -224,31 +643,16 @@ class GeoAnalyzer:
         Returns:
             Tuple of (latitude, longitude)
         """
-        # Approximate center coordinates for common countries
-        coordinates = {
-            'US': (37.0902, -95.7129),
-            'GB': (55.3781, -3.4360),
-            'DE': (51.1657, 10.4515),
-            'FR': (46.2276, 2.2137),
-            'NL': (52.1326, 5.2913),
-            'CA': (56.1304, -106.3468),
-            'AU': (-25.2744, 133.7751),
-            'JP': (36.2048, 138.2529),
-            'CN': (35.8617, 104.1954),
-            'IN': (20.5937, 78.9629),
-            'BR': (-14.2350, -51.9253),
-            'RU': (61.5240, 105.3188),
-            'SG': (1.3521, 103.8198),
-            'EU': (50.8503, 4.3517),  # Brussels as generic EU
-        }
-        
-        return coordinates.get(country_code, (0, 0))
+        return COUNTRY_COORDINATES.get(country_code, (0, 0))
     
     def enrich_nodes(self, nodes: List[VPNNode], use_api: bool = False, 
                      max_api_calls: int = 100) -> List[VPNNode]:
         """
         Enrich multiple nodes with geolocation data.
         
+        API lookups go through the IPInfo (when a token is configured) and
+        ip-api.com batch endpoints, where each call resolves up to 100 IPs.
+        
         Args:
             nodes: List of VPNNodes to enrich
             use_api: Whether to use external APIs
@@ -257,21 +661,136 @@ class GeoAnalyzer:
         Returns:
             List of enriched VPNNodes
         """
-        enriched_nodes = []
-        api_calls_made = 0
+        return list(self._iter_enriched_nodes(nodes, use_api, max_api_calls))
+    
+    def enrich_and_assess(self, nodes: List[VPNNode], risk_engine: RiskEngine,
+                          use_api: bool = False, max_api_calls: int = 100) -> Iterator[VPNNode]:
+        """
+        Enrich and assess nodes in a single pass.
+        
+        Each node is assessed as soon as its geolocation data is known,
+        instead of running enrich_nodes and assess_nodes back to back.
+        
+        Args:
+            nodes: List of VPNNodes to enrich
+            risk_engine: RiskEngine used to assess each node
+            use_api: Whether to use external APIs
+            max_api_calls: Maximum number of API calls to make
+            
+        Yields:
+            Enriched and assessed VPNNodes
+        """
+        for node in self._iter_enriched_nodes(nodes, use_api, max_api_calls):
+            yield risk_engine.assess_node(node)
+    
+    def _iter_enriched_nodes(self, nodes: List[VPNNode], use_api: bool,
+                             max_api_calls: int) -> Iterator[VPNNode]:
+        """Yield nodes in order as they are enriched."""
+        if use_api:
+            yield from self._iter_enriched_batch(nodes, max_api_calls)
+            return
         
         for node in nodes:
-            # Limit API calls to avoid rate limits and costs
-            should_use_api = use_api and api_calls_made < max_api_calls
+            yield self.enrich_node(node)
+        
+        self.logger.info(f"Enriched {len(nodes)} nodes")
+    
+    def _iter_enriched_batch(self, nodes: List[VPNNode], max_api_calls: int) -> Iterator[VPNNode]:
+        """
+        Enrich nodes using batched IP lookups.
+        
+        All lookups are made up front; nodes are then yielded in order.
+        
+        Args:
+            nodes: List of VPNNodes to enrich
+            max_api_calls: Maximum number of batch requests to make
             
-            enriched_node = self.enrich_node(node, use_api=should_use_api)
-            enriched_nodes.append(enriched_node)
+        Yields:
+            Enriched VPNNodes
+        """
+        pending = [node for node in nodes if not (node.latitude and node.longitude and node.country)]
+        
+        # IPs found in the local database or the cache do not count towards
+        # max_api_calls
+        ips = list(dict.fromkeys(node.ip for node in pending))
+        ip_data = {}
+        if self.maxmind_reader is not None:
+            for ip in ips:
+                local_data = self.lookup_ip_maxmind(ip)
+                if local_data:
+                    ip_data[ip] = local_data
+        ip_data.update(self._cached_lookups([ip for ip in ips if ip not in ip_data]))
+        cache_hits = len(ip_data)
+        
+        api_data, api_calls_made = self._batch_lookup([ip for ip in ips if ip not in ip_data], max_api_calls)
+        ip_data.update(api_data)
+        
+        for node in nodes:
+            if not (node.latitude and node.longitude and node.country):
+                if node.ip in ip_data:
+                    self._merge_ip_data(node, ip_data[node.ip])
+                else:
+                    self._apply_fallback_data(node)
+            yield node
+        
+        self.logger.info(
+            f"Enriched {len(nodes)} nodes ({cache_hits} resolved locally, {len(ip_data) - cache_hits} resolved "
+            f"in {api_calls_made} batch API calls)"
+        )
+    
+    def enrich_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply fallback enrichment to every row of a node DataFrame at once.
+        
+        Column-wise equivalent of enrich_nodes with use_api=False: rows that
+        lack coordinates or a country get the same estimates as
+        _apply_fallback_data.
+        
+        Args:
+            df: DataFrame with at least an 'ip' column
             
-            if should_use_api and enriched_node.latitude:
-                api_calls_made += 1
+        Returns:
+            Enriched copy of df
+        """
+        # Columns are only replaced below, so a shallow copy keeps the input
+        # intact without duplicating its data
+        df = df.copy(deep=False)
+        
+        country = df['country'].astype(object) if 'country' in df.columns \
+            else pd.Series(None, index=df.index, dtype=object)
+        # Work in float64 so the filled-in coordinates also fit into float32 columns
+        latitude = pd.to_numeric(df['latitude'], errors='coerce').astype(float) if 'latitude' in df.columns \
+            else pd.Series(np.nan, index=df.index)
+        longitude = pd.to_numeric(df['longitude'], errors='coerce').astype(float) if 'longitude' in df.columns \
+            else pd.Series(np.nan, index=df.index)
+        
+        has_country = country.notna() & (country != '')
+        has_coords = latitude.notna() & (latitude != 0) & longitude.notna() & (longitude != 0)
+        
+        # Rows whose first octet cannot be parsed are left untouched, as in
+        # _apply_fallback_data
+        first_octet = pd.Series(_first_octets(df['ip'].tolist()), index=df.index)
+        fallback = ~(has_country & has_coords) & first_octet.notna()
+        
+        # Rough regional mapping (demonstration only)
+        estimated_country = np.select(
+            [first_octet < 50, first_octet < 100, first_octet < 150],
+            ['US', 'EU', 'CN'],
+            default='Unknown'
+        )
+        country = country.where(~(fallback & ~has_country), estimated_country)
+        
+        fill_coords = fallback & ~has_coords
+        codes = COUNTRY_CODES.get_indexer(country[fill_coords])
+        latitude[fill_coords] = COUNTRY_LAT[codes]
+        longitude[fill_coords] = COUNTRY_LON[codes]
+        
+        df['country'] = country
+        df['latitude'] = latitude
+        df['longitude'] = longitude
         
-        self.logger.info(f"Enriched {len(enriched_nodes)} nodes ({api_calls_made} API calls)")
-        return enriched_nodes
+        self.logger.info(f"Enriched {len(df)} rows ({int(fallback.sum())} with fallback data)")
+        return df
     
     def get_country_name(self, country_code: str) -> str:
         """
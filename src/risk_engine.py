@@ -3,9 +3,14 @@ Risk Assessment Engine
 Evaluates VPN/Tor exit nodes and assigns risk levels based on multiple factors.
 """
 
-from typing import Dict, List, Optional
+import re
+import sys
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
+import numpy as np
+import pandas as pd
 
 
 class RiskLevel(Enum):
@@ -16,7 +21,15 @@ class RiskLevel(Enum):
     UNKNOWN = "Unknown"
 
 
-@dataclass
+# Label of each risk level; a dict lookup is cheaper than Enum.value in bulk
+RISK_LEVEL_VALUES = {level: level.value for level in RiskLevel}
+
+
+# Slotted nodes are smaller and faster to read; dataclass slots need Python 3.10+
+_NODE_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_NODE_DATACLASS_OPTIONS)
 class VPNNode:
     """Data model for VPN/Tor exit node."""
     ip: str
@@ -73,11 +86,15 @@ class RiskEngine:
             config: Configuration dictionary containing risk rules
         """
         self.config = config
-        self.high_risk_ports = set(config.get('high_risk_ports', []))
-        self.medium_risk_ports = set(config.get('medium_risk_ports', []))
+        self.high_risk_ports = frozenset(config.get('high_risk_ports', []))
+        self.medium_risk_ports = frozenset(config.get('medium_risk_ports', []))
         self.datacenter_keywords = [
             kw.lower() for kw in config.get('datacenter_asn_keywords', [])
         ]
+        # All keywords as one alternation, scanned in a single pass per string
+        self.datacenter_pattern = re.compile(
+            '|'.join(re.escape(kw) for kw in self.datacenter_keywords)
+        ) if self.datacenter_keywords else None
         self.thresholds = config.get('thresholds', {
             'high': 7.0,
             'medium': 4.0,
@@ -107,23 +124,20 @@ class RiskEngine:
                 risk_factors.append(f"Medium-risk port ({node.port})")
         
         # ISP/ASN analysis - datacenter hosting indicator
-        if node.isp:
-            isp_lower = node.isp.lower()
-            if any(keyword in isp_lower for keyword in self.datacenter_keywords):
-                risk_score += 2.0
-                risk_factors.append("Datacenter/hosting provider")
-        
-        if node.asn:
-            asn_lower = node.asn.lower()
-            if any(keyword in asn_lower for keyword in self.datacenter_keywords):
-                risk_score += 1.5
-                risk_factors.append("Datacenter ASN pattern")
+        isp_lower = node.isp.lower() if node.isp else ''
+        if isp_lower and self._has_datacenter_keyword(isp_lower):
+            risk_score += 2.0
+            risk_factors.append("Datacenter/hosting provider")
+        
+        if node.asn and self._has_datacenter_keyword(node.asn.lower()):
+            risk_score += 1.5
+            risk_factors.append("Datacenter ASN pattern")
         
         # Multiple active ports on same IP (would need historical data)
         # This is a placeholder for demonstration
         
         # Known VPN provider indicators
-        if node.isp and 'vpn' in node.isp.lower():
+        if 'vpn' in isp_lower:
             risk_score += 1.0
             risk_factors.append("Known VPN provider")
         
@@ -157,6 +171,100 @@ class RiskEngine:
         
         return node
     
+    def assess_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Assess risk for every row of a node DataFrame at once.
+        
+        Applies the same rules as assess_node, but as column operations
+        instead of a Python loop over VPNNode objects.
+        
+        Args:
+            df: DataFrame with node columns (ip, port, country, asn, isp, ...)
+            
+        Returns:
+            Copy of df with risk_score, risk_level and risk_factors columns
+        """
+        # Only whole columns are assigned, so a shallow copy keeps the input
+        # intact; chained after enrich_dataframe no node data is copied
+        df = df.copy(deep=False)
+        n = len(df)
+        
+        port = pd.to_numeric(df['port'], errors='coerce') if 'port' in df.columns \
+            else pd.Series(np.nan, index=df.index)
+        # Text rules are evaluated once per distinct value and expanded to rows
+        isp_codes, isp = self._lower_text(df, 'isp')
+        asn_codes, asn = self._lower_text(df, 'asn')
+        country_codes, country = self._lower_text(df, 'country')
+        
+        high_port = port.isin(self.high_risk_ports).to_numpy()
+        medium_port = ~high_port & port.isin(self.medium_risk_ports).to_numpy()
+        datacenter_isp = self._contains_keyword(isp).to_numpy()[isp_codes]
+        datacenter_asn = self._contains_keyword(asn).to_numpy()[asn_codes]
+        vpn_isp = isp.str.contains('vpn', regex=False).to_numpy()[isp_codes]
+        missing_fields = ((country == '').to_numpy()[country_codes].astype(int)
+                          + (isp == '').to_numpy()[isp_codes].astype(int)
+                          + (asn == '').to_numpy()[asn_codes].astype(int))
+        insufficient = missing_fields >= 2
+        
+        # Accumulate in the same order as assess_node so scores match exactly.
+        # Every rule adds a multiple of 0.5, so float32 holds the sums exactly.
+        risk_score = np.zeros(n, dtype=np.float32)
+        risk_score += np.where(high_port, 3.0, np.where(medium_port, 1.5, 0.0))
+        risk_score += np.where(datacenter_isp, 2.0, 0.0)
+        risk_score += np.where(datacenter_asn, 1.5, 0.0)
+        risk_score += np.where(vpn_isp, 1.0, 0.0)
+        risk_score += np.where(insufficient, 0.5, 0.0)
+        
+        risk_level = np.select(
+            [risk_score >= self.thresholds['high'],
+             risk_score >= self.thresholds['medium'],
+             risk_score > 0],
+            [RiskLevel.HIGH.value, RiskLevel.MEDIUM.value, RiskLevel.LOW.value],
+            default=RiskLevel.UNKNOWN.value
+        )
+        
+        risk_factors = [[] for _ in range(n)]
+        port_values = port.to_numpy()
+        for i in np.flatnonzero(high_port):
+            risk_factors[i].append(f"High-risk port ({int(port_values[i])})")
+        for i in np.flatnonzero(medium_port):
+            risk_factors[i].append(f"Medium-risk port ({int(port_values[i])})")
+        for mask, factor in ((datacenter_isp, "Datacenter/hosting provider"),
+                             (datacenter_asn, "Datacenter ASN pattern"),
+                             (vpn_isp, "Known VPN provider"),
+                             (insufficient, "Insufficient metadata")):
+            for i in np.flatnonzero(mask):
+                risk_factors[i].append(factor)
+        
+        df['risk_score'] = np.round(risk_score, 2)
+        df['risk_level'] = risk_level
+        df['risk_factors'] = risk_factors
+        return df
+    
+    @staticmethod
+    def _lower_text(df: pd.DataFrame, column: str) -> Tuple[np.ndarray, pd.Series]:
+        """
+        Distinct lower-cased values of a text column and each row's code into them.
+        
+        Missing values get code -1, which indexes a trailing empty string, so
+        per-value results expand to rows with result[codes].
+        """
+        if column not in df.columns:
+            return np.full(len(df), -1), pd.Series([''])
+        codes, uniques = pd.factorize(df[column])
+        values = np.append(np.asarray(uniques, dtype=object), '')
+        return codes, pd.Series(values, dtype=object).astype(str).str.lower()
+    
+    def _has_datacenter_keyword(self, text: str) -> bool:
+        """Whether lower-cased text contains any datacenter keyword."""
+        return self.datacenter_pattern is not None and self.datacenter_pattern.search(text) is not None
+    
+    def _contains_keyword(self, text: pd.Series) -> pd.Series:
+        """Whether each value contains any datacenter keyword."""
+        if self.datacenter_pattern is None:
+            return pd.Series(False, index=text.index)
+        return text.str.contains(self.datacenter_pattern.pattern, regex=True)
+    
     def assess_nodes(self, nodes: List[VPNNode]) -> List[VPNNode]:
         """
         Assess multiple nodes.
@@ -169,12 +277,13 @@ class RiskEngine:
         """
         return [self.assess_node(node) for node in nodes]
     
-    def get_statistics(self, nodes: List[VPNNode]) -> Dict:
+    def get_statistics(self, nodes: Union[List[VPNNode], pd.DataFrame]) -> Dict:
         """
         Calculate risk statistics for a collection of nodes.
         
         Args:
-            nodes: List of assessed VPNNode instances
+            nodes: List of assessed VPNNode instances, or an assessed node
+                DataFrame, which is counted column-wise
             
         Returns:
             Dictionary containing risk statistics
@@ -190,18 +299,16 @@ class RiskEngine:
                 'average_score': 0.0
             }
         
-        risk_counts = {
-            RiskLevel.HIGH: 0,
-            RiskLevel.MEDIUM: 0,
-            RiskLevel.LOW: 0,
-            RiskLevel.UNKNOWN: 0
-        }
-        
-        total_score = 0.0
-        
-        for node in nodes:
-            risk_counts[node.risk_level] += 1
-            total_score += node.risk_score
+        if isinstance(nodes, pd.DataFrame):
+            # One bincount over the risk level codes
+            levels = [RiskLevel.HIGH, RiskLevel.MEDIUM, RiskLevel.LOW, RiskLevel.UNKNOWN]
+            codes = pd.Categorical(nodes['risk_level'], categories=[level.value for level in levels]).codes
+            counts = np.bincount(codes[codes >= 0], minlength=len(levels))
+            risk_counts = dict(zip(levels, counts.tolist()))
+            total_score = float(nodes['risk_score'].to_numpy(dtype=np.float64).sum())
+        else:
+            risk_counts = Counter(node.risk_level for node in nodes)
+            total_score = sum(node.risk_score for node in nodes)
         
         return {
             'total': total,
@@ -5,8 +5,35 @@ Common helper functions used across the application.
 
 import yaml
 import os
+import re
+import ipaddress
 from typing import Dict, Optional
 import logging
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# libyaml-backed loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+# Dotted-quad IPv4 address with octets 0-255 and no leading zeros, as accepted
+# by the ipaddress module
+_OCTET = r'(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+IPV4_STRICT_PATTERN = rf'{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}'
+IPV4_STRICT_RE = re.compile(IPV4_STRICT_PATTERN)
+
+# Folium marker color for each risk level value
+MARKER_COLORS = {
+    'High': 'red',
+    'Medium': 'orange',
+    'Low': 'green',
+    'Unknown': 'gray'
+}
 
 
 def load_config(config_path: str = "config/config.yaml") -> Dict:
@@ -22,7 +49,7 @@ def load_config(config_path: str = "config/config.yaml") -> Dict:
     try:
         if os.path.exists(config_path):
             with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
+                return yaml.load(f, Loader=YAML_LOADER)
         else:
             # Return default configuration if file doesn't exist
             return get_default_config()
@@ -41,6 +68,7 @@ def get_default_config() -> Dict:
     return {
         'api': {
             'ipinfo_token': '',
+            'maxmind_db': '',
             'rate_limit': {
                 'requests_per_minute': 50,
                 'requests_per_day': 1000
@@ -64,7 +92,9 @@ def get_default_config() -> Dict:
                 'default_zoom': 2,
                 'default_center': [20, 0],
                 'cluster_radius': 50,
-                'max_cluster_radius': 80
+                'max_cluster_radius': 80,
+                'deck_threshold': 5000,
+                'cluster_threshold': 500
             },
             'colors': {
                 'high_risk': '#FF4444',
@@ -76,6 +106,7 @@ def get_default_config() -> Dict:
         'data': {
             'max_records': 10000,
             'cache_timeout': 3600,
+            'cache_dir': '',
             'required_columns': ['ip'],
             'optional_columns': [
                 'port', 'country', 'asn', 'isp', 
@@ -106,14 +137,42 @@ def validate_ip(ip: str) -> bool:
     Returns:
         True if valid, False otherwise
     """
+    # Plain IPv4 addresses are accepted without building an address object
+    if isinstance(ip, str) and IPV4_STRICT_RE.fullmatch(ip):
+        return True
+    
     try:
-        import ipaddress
         ipaddress.ip_address(ip)
         return True
     except ValueError:
         return False
 
 
+def validate_ip_series(ips: pd.Series) -> pd.Series:
+    """
+    Validate a column of IP addresses.
+    
+    Plain IPv4 addresses are matched with one vectorized regex; only the
+    remaining values (IPv6, invalid entries) go through validate_ip. With
+    pyarrow installed the match runs over Arrow's contiguous string buffer
+    instead of calling re once per Python string.
+    
+    Args:
+        ips: Series of IP address strings
+        
+    Returns:
+        Boolean Series, True where validate_ip would return True
+    """
+    strings = ips.astype('string[pyarrow]' if PYARROW_AVAILABLE else str)
+    valid = strings.str.fullmatch(IPV4_STRICT_PATTERN).fillna(False).to_numpy(dtype=bool, copy=True)
+    
+    rest = ~valid
+    if rest.any():
+        valid[rest] = ips[rest].map(validate_ip).to_numpy(dtype=bool)
+    
+    return pd.Series(valid, index=ips.index)
+
+
 def format_number(num: int) -> str:
     """
     Format number with thousand separators.
@@ -167,6 +226,20 @@ def get_risk_color(risk_level: str, config: Dict) -> str:
         return colors.get('unknown', '#CCCCCC')
 
 
+def hex_to_rgb(hex_color: str) -> list:
+    """
+    Convert a '#RRGGBB' color to an [r, g, b] list.
+    
+    Args:
+        hex_color: Color hex code
+        
+    Returns:
+        List of red, green and blue components (0-255)
+    """
+    hex_color = hex_color.lstrip('#')
+    return [int(hex_color[i:i + 2], 16) for i in (0, 2, 4)]
+
+
 def setup_logging(level: str = "INFO"):
     """
     Setup application logging.
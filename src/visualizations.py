@@ -3,15 +3,82 @@ Visualization Module
 Creates interactive maps and charts for VPN/Tor exit node analysis.
 """
 
-import plotly.express as px
 import plotly.graph_objects as go
 import folium
-from folium.plugins import MarkerCluster, HeatMap
+from folium.plugins import FastMarkerCluster, HeatMap
+import pydeck as pdk
 import pandas as pd
-from typing import List, Dict
+import numpy as np
+from typing import List, Dict, Optional, Tuple, Union
+from operator import attrgetter
 import logging
-from src.risk_engine import VPNNode, RiskLevel
-from src.utils import get_risk_color
+from src.risk_engine import VPNNode, RiskLevel, RISK_LEVEL_VALUES
+from src.utils import get_risk_color, MARKER_COLORS
+
+
+# Map marker color for each risk level
+MARKER_STYLES = {level: MARKER_COLORS[level.value] for level in RiskLevel}
+
+# Marker popup, filled per node with str.format_map
+POPUP_TEMPLATE = (
+    '<div style="font-family: Arial; font-size: 12px; min-width: 200px;">'
+    '<b>IP:</b> {ip}<br>'
+    '<b>Port:</b> {port}<br>'
+    '<b>Country:</b> {country}<br>'
+    '<b>City:</b> {city}<br>'
+    '<b>ISP:</b> {isp}<br>'
+    '<b>ASN:</b> {asn}<br>'
+    '<b>Risk Level:</b> <span style="color: {color}; font-weight: bold;">{risk_level}</span><br>'
+    '<b>Risk Score:</b> {risk_score}<br>'
+    '{risk_factors}'
+    '</div>'
+)
+
+# Node fields the charts read, gathered from a node list by _nodes_to_df
+CHART_COLUMNS = ('ip', 'port', 'country', 'isp', 'latitude', 'longitude', 'risk_score', 'risk_level')
+
+# Builds clustered markers in the browser from [lat, lon, color, popup, tooltip] rows
+CLUSTER_MARKER_CALLBACK = """
+var callback = function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 7, color: row[2], fillColor: row[2], fillOpacity: 0.8, weight: 1
+    });
+    marker.bindPopup(row[3], {maxWidth: 300});
+    marker.bindTooltip(row[4]);
+    return marker;
+};
+"""
+
+# Leaflet.markercluster options: add markers in short chunks so the page stays
+# responsive, and stop clustering once zoomed in to city level
+CLUSTER_OPTIONS = {
+    'chunkedLoading': True,
+    'chunkedInterval': 100,
+    'chunkedDelay': 50,
+    'disableClusteringAtZoom': 10,
+    'showCoverageOnHover': False
+}
+
+
+def _grid_cells(coords: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Snap (lat, lon) rows to a square grid.
+    
+    Args:
+        coords: Array of shape (n, 2) with latitude and longitude
+        cell_size: Grid cell size in degrees
+        
+    Returns:
+        Tuple of (cell centers of shape (cells, 2), cell index of each row)
+    """
+    cells = np.floor(coords / cell_size)
+    cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+    return (cells + 0.5) * cell_size, inverse.ravel()
+
+
+def _geolocated(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of a node DataFrame with non-zero latitude and longitude."""
+    return df[(df['latitude'].fillna(0) != 0) & (df['longitude'].fillna(0) != 0)]
 
 
 class Visualizer:
@@ -30,15 +97,39 @@ class Visualizer:
         self.viz_config = config.get('visualization', {})
         self.map_config = self.viz_config.get('map', {})
         self.colors = self.viz_config.get('colors', {})
+        self.deck_threshold = self.map_config.get('deck_threshold', 5000)
+        self.cluster_threshold = self.map_config.get('cluster_threshold', 500)
         self.logger = logging.getLogger(__name__)
     
+    def _nodes_to_df(self, nodes: List[VPNNode]) -> pd.DataFrame:
+        """
+        Gather the chart fields of a node list into a DataFrame.
+        
+        Args:
+            nodes: List of VPNNode objects
+            
+        Returns:
+            DataFrame with CHART_COLUMNS, risk_level as plain strings
+        """
+        if nodes:
+            columns = dict(zip(CHART_COLUMNS, map(list, zip(*map(attrgetter(*CHART_COLUMNS), nodes)))))
+            columns['risk_level'] = list(map(RISK_LEVEL_VALUES.__getitem__, columns['risk_level']))
+        else:
+            columns = {col: [] for col in CHART_COLUMNS}
+        
+        df = pd.DataFrame(columns)
+        for col in ('latitude', 'longitude', 'port', 'risk_score'):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
+    
     def create_world_map(self, nodes: List[VPNNode], use_clusters: bool = True) -> folium.Map:
         """
         Create interactive world map with VPN exit nodes.
         
         Args:
             nodes: List of VPNNode objects
-            use_clusters: Whether to cluster nearby markers
+            use_clusters: Whether to cluster nearby markers (always on at or
+                above the configured cluster_threshold)
             
         Returns:
             Folium Map object
@@ -47,75 +138,71 @@ class Visualizer:
         center = self.map_config.get('default_center', [20, 0])
         zoom = self.map_config.get('default_zoom', 2)
         
+        # Draw vector markers on one canvas instead of an SVG element each
         m = folium.Map(
             location=center,
             zoom_start=zoom,
-            tiles='OpenStreetMap'
+            tiles='OpenStreetMap',
+            prefer_canvas=True
         )
         
         # Add alternative tile layers
         folium.TileLayer('CartoDB positron').add_to(m)
         folium.TileLayer('CartoDB dark_matter').add_to(m)
         
-        # Prepare marker cluster if enabled
-        if use_clusters:
-            marker_cluster = MarkerCluster(
-                name='VPN/Tor Exit Nodes',
-                overlay=True,
-                control=True
-            ).add_to(m)
-        
-        # Add markers for each node
+        # Collect marker data for each node
+        markers = []
         for node in nodes:
             if node.latitude is None or node.longitude is None:
                 continue
             
             # Determine marker color based on risk level
-            if node.risk_level == RiskLevel.HIGH:
-                color = 'red'
-                icon = 'exclamation-triangle'
-            elif node.risk_level == RiskLevel.MEDIUM:
-                color = 'orange'
-                icon = 'exclamation-circle'
-            elif node.risk_level == RiskLevel.LOW:
-                color = 'green'
-                icon = 'info-circle'
-            else:
-                color = 'gray'
-                icon = 'question-circle'
+            color = MARKER_STYLES[node.risk_level]
             
             # Create popup content
-            popup_html = f"""
-            <div style="font-family: Arial; font-size: 12px; min-width: 200px;">
-                <b>IP:</b> {node.ip}<br>
-                <b>Port:</b> {node.port or 'N/A'}<br>
-                <b>Country:</b> {node.country or 'Unknown'}<br>
-                <b>City:</b> {node.city or 'Unknown'}<br>
-                <b>ISP:</b> {node.isp or 'Unknown'}<br>
-                <b>ASN:</b> {node.asn or 'Unknown'}<br>
-                <b>Risk Level:</b> <span style="color: {color}; font-weight: bold;">
-                    {node.risk_level.value}
-                </span><br>
-                <b>Risk Score:</b> {node.risk_score}<br>
-                {'<b>Risk Factors:</b><br>' + '<br>'.join(f'• {f}' for f in node.risk_factors) if node.risk_factors else ''}
-            </div>
-            """
-            
-            popup = folium.Popup(popup_html, max_width=300)
+            popup_html = POPUP_TEMPLATE.format_map({
+                'ip': node.ip,
+                'port': node.port or 'N/A',
+                'country': node.country or 'Unknown',
+                'city': node.city or 'Unknown',
+                'isp': node.isp or 'Unknown',
+                'asn': node.asn or 'Unknown',
+                'color': color,
+                'risk_level': RISK_LEVEL_VALUES[node.risk_level],
+                'risk_score': node.risk_score,
+                'risk_factors': ('<b>Risk Factors:</b><br>' + '<br>'.join(map('• {}'.format, node.risk_factors))
+                                 if node.risk_factors else '')
+            })
             
-            # Create marker
-            marker = folium.Marker(
-                location=[node.latitude, node.longitude],
-                popup=popup,
-                tooltip=f"{node.ip} ({node.country})",
-                icon=folium.Icon(color=color, icon=icon, prefix='fa')
+            markers.append(
+                [node.latitude, node.longitude, color, popup_html, f"{node.ip} ({node.country})"]
             )
-            
-            # Add to cluster or directly to map
-            if use_clusters:
-                marker.add_to(marker_cluster)
-            else:
-                marker.add_to(m)
+        
+        if use_clusters or len(markers) >= self.cluster_threshold:
+            # Ship plain rows and let one JS callback create the markers in the
+            # browser, instead of serializing a Marker/Popup per node
+            FastMarkerCluster(
+                markers,
+                callback=CLUSTER_MARKER_CALLBACK,
+                options=dict(CLUSTER_OPTIONS, maxClusterRadius=self.map_config.get('max_cluster_radius', 80)),
+                name='VPN/Tor Exit Nodes',
+                overlay=True,
+                control=True
+            ).add_to(m)
+        else:
+            # Same circle markers as the clustered callback draws
+            for lat, lon, color, popup_html, tooltip in markers:
+                folium.CircleMarker(
+                    location=[lat, lon],
+                    radius=7,
+                    color=color,
+                    weight=1,
+                    fill=True,
+                    fill_color=color,
+                    fill_opacity=0.8,
+                    popup=folium.Popup(popup_html, max_width=300),
+                    tooltip=tooltip
+                ).add_to(m)
         
         # Add layer control
         folium.LayerControl().add_to(m)
@@ -123,12 +210,68 @@ class Visualizer:
         self.logger.info(f"Created world map with {len(nodes)} nodes")
         return m
     
-    def create_heatmap(self, nodes: List[VPNNode]) -> folium.Map:
+    def create_world_deck(self, df: pd.DataFrame) -> pdk.Deck:
+        """
+        Create a WebGL scatter map of exit nodes for large datasets.
+        
+        Unlike create_world_map, points are drawn on a single canvas layer,
+        so the browser stays responsive with tens of thousands of nodes.
+        
+        Args:
+            df: Node DataFrame as produced by DataProcessor.nodes_to_dataframe,
+                including its precomputed 'risk_rgb' column
+            
+        Returns:
+            pydeck Deck object
+        """
+        geo = df.dropna(subset=['latitude', 'longitude'])
+        
+        data = pd.DataFrame({
+            'latitude': geo['latitude'].astype(float),
+            'longitude': geo['longitude'].astype(float),
+            'ip': geo['ip'].astype(str),
+            'country': geo['country'].astype(object).fillna('Unknown'),
+            'risk_level': geo['risk_level'].astype(str),
+            'risk_score': geo['risk_score'].astype(float),
+            'fill_color': geo['risk_rgb']
+        })
+        
+        layer = pdk.Layer(
+            'ScatterplotLayer',
+            data,
+            get_position=['longitude', 'latitude'],
+            get_fill_color='fill_color',
+            get_radius=20000,
+            radius_min_pixels=3,
+            radius_max_pixels=10,
+            pickable=True
+        )
+        
+        center = self.map_config.get('default_center', [20, 0])
+        zoom = self.map_config.get('default_zoom', 2)
+        
+        deck = pdk.Deck(
+            layers=[layer],
+            initial_view_state=pdk.ViewState(latitude=center[0], longitude=center[1], zoom=zoom),
+            map_provider='carto',
+            map_style='light',
+            tooltip={'html': '<b>{ip}</b> ({country})<br>Risk: {risk_level} ({risk_score})'}
+        )
+        
+        self.logger.info(f"Created deck map with {len(data)} nodes")
+        return deck
+    
+    def create_heatmap(self, nodes: Union[List[VPNNode], pd.DataFrame], cell_size: float = 0.5) -> folium.Map:
         """
         Create heat map of VPN exit node density.
         
+        Nodes are summed into a grid of cell_size degrees before being sent to
+        the browser, so the payload grows with the covered area, not the
+        number of nodes.
+        
         Args:
-            nodes: List of VPNNode objects
+            nodes: List of VPNNode objects, or a node DataFrame
+            cell_size: Grid cell size in degrees
             
         Returns:
             Folium Map object with heat map
@@ -142,13 +285,16 @@ class Visualizer:
             tiles='CartoDB dark_matter'
         )
         
-        # Prepare heat map data
-        heat_data = []
-        for node in nodes:
-            if node.latitude and node.longitude:
-                # Weight by risk score
-                weight = node.risk_score if node.risk_score > 0 else 1.0
-                heat_data.append([node.latitude, node.longitude, weight])
+        # Prepare heat map data, weighted by risk score
+        df = nodes if isinstance(nodes, pd.DataFrame) else self._nodes_to_df(nodes)
+        geo = _geolocated(df)
+        weights = geo['risk_score'].to_numpy(dtype=float)
+        weights = np.where(weights > 0, weights, 1.0)
+        
+        # Sum weights per grid cell
+        centers, inverse = _grid_cells(geo[['latitude', 'longitude']].to_numpy(dtype=float), cell_size)
+        totals = np.bincount(inverse, weights=weights, minlength=len(centers))
+        heat_data = np.column_stack([centers, totals]).tolist()
         
         if heat_data:
             HeatMap(
@@ -169,12 +315,12 @@ class Visualizer:
         self.logger.info(f"Created heat map with {len(heat_data)} points")
         return m
     
-    def create_risk_distribution_chart(self, nodes: List[VPNNode]) -> go.Figure:
+    def create_risk_distribution_chart(self, nodes: Union[List[VPNNode], pd.Series]) -> go.Figure:
         """
         Create pie chart showing risk level distribution.
         
         Args:
-            nodes: List of VPNNode objects
+            nodes: List of VPNNode objects, or precomputed counts per risk level
             
         Returns:
             Plotly Figure object
@@ -186,8 +332,9 @@ class Visualizer:
             'Unknown': 0
         }
         
-        for node in nodes:
-            risk_counts[node.risk_level.value] += 1
+        if not isinstance(nodes, pd.Series):
+            nodes = self._nodes_to_df(nodes)['risk_level'].value_counts()
+        risk_counts.update(nodes.to_dict())
         
         colors = [
             self.colors.get('high_risk', '#FF4444'),
@@ -213,103 +360,108 @@ class Visualizer:
         
         return fig
     
-    def create_country_distribution_chart(self, nodes: List[VPNNode], top_n: int = 15) -> go.Figure:
+    def create_country_distribution_chart(self, nodes: Union[List[VPNNode], pd.Series],
+                                          top_n: int = 15) -> go.Figure:
         """
         Create bar chart showing country-wise distribution.
         
         Args:
-            nodes: List of VPNNode objects
+            nodes: List of VPNNode objects, or precomputed counts per country
+                sorted in descending order
             top_n: Number of top countries to show
             
         Returns:
             Plotly Figure object
         """
-        # Count nodes by country
-        country_counts = {}
-        for node in nodes:
-            country = node.country or 'Unknown'
-            country_counts[country] = country_counts.get(country, 0) + 1
-        
-        # Sort and get top N
-        sorted_countries = sorted(country_counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
-        countries, counts = zip(*sorted_countries) if sorted_countries else ([], [])
-        
-        fig = go.Figure(data=[go.Bar(
-            x=list(countries),
-            y=list(counts),
-            marker=dict(
-                color=list(counts),
-                colorscale='Viridis',
-                showscale=True
-            ),
-            text=list(counts),
-            textposition='auto'
-        )])
-        
-        fig.update_layout(
-            title=f'Top {top_n} Countries by Exit Node Count',
-            xaxis_title='Country',
-            yaxis_title='Number of Nodes',
-            height=400
-        )
-        
-        return fig
+        if not isinstance(nodes, pd.Series):
+            country = self._nodes_to_df(nodes)['country']
+            nodes = country.where(country.notna() & (country != ''), 'Unknown').value_counts()
+        return self._top_n_bar(nodes, top_n, f'Top {top_n} Countries by Exit Node Count', 'Country')
     
-    def create_port_distribution_chart(self, nodes: List[VPNNode], top_n: int = 15) -> go.Figure:
+    def create_port_distribution_chart(self, nodes: Union[List[VPNNode], pd.Series],
+                                       top_n: int = 15) -> go.Figure:
         """
         Create bar chart showing port usage distribution.
         
         Args:
-            nodes: List of VPNNode objects
+            nodes: List of VPNNode objects, or precomputed counts per port
+                sorted in descending order
             top_n: Number of top ports to show
             
         Returns:
             Plotly Figure object
         """
-        port_counts = {}
-        for node in nodes:
-            if node.port:
-                port_counts[node.port] = port_counts.get(node.port, 0) + 1
+        if not isinstance(nodes, pd.Series):
+            port = self._nodes_to_df(nodes)['port']
+            nodes = port[port.notna() & (port != 0)].astype(int).value_counts()
+        return self._top_n_bar(nodes, top_n, f'Top {top_n} Ports by Usage', 'Port Number', color='lightblue')
+    
+    def _top_n_bar(self, counts: pd.Series, top_n: int, title: str, xaxis_title: str,
+                   color: Optional[str] = None) -> go.Figure:
+        """
+        Create a bar chart of the first top_n entries of a count Series.
         
-        sorted_ports = sorted(port_counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
-        ports, counts = zip(*sorted_ports) if sorted_ports else ([], [])
+        Args:
+            counts: Counts per category, sorted in descending order
+            top_n: Number of categories to show
+            title: Chart title
+            xaxis_title: Category axis title
+            color: Bar color; bars are shaded by count when omitted
+            
+        Returns:
+            Plotly Figure object
+        """
+        top = counts.head(top_n)
+        values = top.tolist()
+        
+        if color is None:
+            marker = dict(color=values, colorscale='Viridis', showscale=True)
+        else:
+            marker = dict(color=color)
         
         fig = go.Figure(data=[go.Bar(
-            x=[str(p) for p in ports],
-            y=list(counts),
-            marker=dict(color='lightblue'),
-            text=list(counts),
+            x=[str(label) for label in top.index],
+            y=values,
+            marker=marker,
+            text=values,
             textposition='auto'
         )])
         
         fig.update_layout(
-            title=f'Top {top_n} Ports by Usage',
-            xaxis_title='Port Number',
+            title=title,
+            xaxis_title=xaxis_title,
             yaxis_title='Number of Nodes',
             height=400
         )
         
         return fig
     
-    def create_risk_score_histogram(self, nodes: List[VPNNode]) -> go.Figure:
+    def create_risk_score_histogram(self, nodes: Union[List[VPNNode], Tuple[np.ndarray, np.ndarray]]) -> go.Figure:
         """
         Create histogram of risk scores.
         
         Args:
-            nodes: List of VPNNode objects
+            nodes: List of VPNNode objects, or precomputed (counts, bin_edges)
+                from np.histogram
             
         Returns:
             Plotly Figure object
         """
-        risk_scores = [node.risk_score for node in nodes]
-        
-        fig = go.Figure(data=[go.Histogram(
-            x=risk_scores,
-            nbinsx=20,
-            marker=dict(
-                color='steelblue',
-                line=dict(color='white', width=1)
-            )
+        marker = dict(
+            color='steelblue',
+            line=dict(color='white', width=1)
+        )
+        
+        # Bin in numpy and send only the bar heights, not every score
+        if not isinstance(nodes, tuple):
+            nodes = np.histogram(self._nodes_to_df(nodes)['risk_score'].to_numpy(dtype=float), bins=20)
+        counts, edges = nodes
+        
+        fig = go.Figure(data=[go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            marker=marker
         )])
         
         fig.update_layout(
@@ -331,47 +483,71 @@ class Visualizer:
         Returns:
             Plotly Figure object
         """
-        df_data = []
+        # Same per-risk-level traces and downsampling as the DataFrame path
+        return self.create_geographic_scatter_df(self._nodes_to_df(nodes))
+    
+    def create_geographic_scatter_df(self, df: pd.DataFrame, sample_per_level: int = 5000) -> go.Figure:
+        """
+        Create geographic scatter plot from a node DataFrame.
+        
+        Large datasets are downsampled to at most sample_per_level random
+        nodes per risk level, so the figure size stays bounded.
+        
+        Args:
+            df: Node DataFrame as produced by DataProcessor.nodes_to_dataframe
+            sample_per_level: Maximum number of nodes drawn per risk level
+            
+        Returns:
+            Plotly Figure object
+        """
+        geo = _geolocated(df)
         
-        for node in nodes:
-            if node.latitude and node.longitude:
-                df_data.append({
-                    'lat': node.latitude,
-                    'lon': node.longitude,
-                    'ip': node.ip,
-                    'country': node.country or 'Unknown',
-                    'risk_level': node.risk_level.value,
-                    'risk_score': node.risk_score,
-                    'isp': node.isp or 'Unknown'
-                })
-        
-        df = pd.DataFrame(df_data)
-        
-        if df.empty:
+        if geo.empty:
             # Return empty figure
             fig = go.Figure()
             fig.update_layout(title='No geographic data available')
             return fig
         
-        fig = px.scatter_geo(
-            df,
-            lat='lat',
-            lon='lon',
-            color='risk_level',
-            hover_name='ip',
-            hover_data=['country', 'risk_score', 'isp'],
-            color_discrete_map={
-                'High': self.colors.get('high_risk', '#FF4444'),
-                'Medium': self.colors.get('medium_risk', '#FFA500'),
-                'Low': self.colors.get('low_risk', '#44FF44'),
-                'Unknown': self.colors.get('unknown', '#CCCCCC')
-            },
-            size_max=10
-        )
+        if len(geo) > sample_per_level:
+            geo = geo.sample(frac=1, random_state=0).groupby('risk_level', observed=True).head(sample_per_level)
+        
+        # Convert each column once, then split the arrays by risk level
+        lat = geo['latitude'].to_numpy(dtype=float)
+        lon = geo['longitude'].to_numpy(dtype=float)
+        ips = geo['ip'].astype(str).to_numpy()
+        hover = np.column_stack([
+            geo['country'].astype(object).fillna('Unknown'),
+            geo['risk_score'].to_numpy(dtype=float),
+            geo['isp'].astype(object).fillna('Unknown')
+        ])
+        levels = geo['risk_level'].astype(str).to_numpy()
+        
+        fig = go.Figure()
+        
+        # One trace per risk level, so the legend toggles levels
+        for level in RiskLevel:
+            mask = levels == level.value
+            if not mask.any():
+                continue
+            
+            fig.add_trace(go.Scattergeo(
+                lat=lat[mask],
+                lon=lon[mask],
+                mode='markers',
+                name=level.value,
+                marker=dict(color=get_risk_color(level.value, self.config)),
+                hovertext=ips[mask],
+                customdata=hover[mask],
+                hovertemplate=(
+                    '<b>%{hovertext}</b><br>country=%{customdata[0]}<br>'
+                    'risk_score=%{customdata[1]}<br>isp=%{customdata[2]}<extra></extra>'
+                )
+            ))
         
         fig.update_layout(
             title='Global VPN/Tor Exit Node Distribution',
             height=600,
+            legend_title_text='risk_level',
             geo=dict(
                 showland=True,
                 landcolor='lightgray',